@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+
+from cache import canonical_key
+from downloader import load_yt_dlp
+from settings import ARCHIVE_FILE
+
+# Matches the "%(title)s [%(id)s].%(ext)s" output template.
+FILENAME_ID_RE = re.compile(r"\[([0-9A-Za-z_-]+)\]\.(?:mp4|m4a|mkv|webm|mov)$")
+# Entries rebuilt from file names know neither the extractor nor the quality.
+ANY = "*"
+# Generic IDs are derived from the file name in the URL, so they are not unique enough to skip on.
+UNTRACKED_EXTRACTORS = ("generic",)
+
+
+def archive_key(extractor: str, video_id: str, quality: str) -> tuple:
+    return ((extractor or ANY).lower(), str(video_id), quality or ANY)
+
+
+def resolve_id(url: str):
+    # (extractor, id) without extracting: YouTube links are parsed locally, other sites go
+    # through the extractors' URL patterns like yt-dlp's own --download-archive check.
+    key = canonical_key(url)
+    if key.startswith("youtube:"):
+        return "youtube", key.split(":", 1)[1]
+    for ie in load_yt_dlp().extractor.gen_extractor_classes():
+        if ie.ie_key().lower() in UNTRACKED_EXTRACTORS or not ie.suitable(url):
+            continue
+        temp_id = ie.get_temp_id(url)
+        return (ie.ie_key().lower(), temp_id) if temp_id else None
+    return None
+
+
+class DownloadArchive:
+    # Append-only index of finished downloads (extractor, id, quality -> file), held in memory as a
+    # dict so lookups stay O(1) for long playlists. Each line is written and fsynced on success.
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                # A line without its newline was cut off by a crash mid-append.
+                if not line.endswith("\n"):
+                    continue
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 4:
+                    self._entries[archive_key(*parts[:3])] = parts[3]
+
+    def contains(self, extractor: str, video_id: str, quality: str) -> bool:
+        if not video_id or (extractor or "").lower() in UNTRACKED_EXTRACTORS:
+            return False
+        candidates = {
+            archive_key(extractor, video_id, quality),
+            archive_key(extractor, video_id, ANY),
+            archive_key(ANY, video_id, quality),
+            archive_key(ANY, video_id, ANY),
+        }
+        with self._lock:
+            for key in candidates:
+                path = self._entries.get(key)
+                if path is None:
+                    continue
+                if path and not os.path.exists(path):
+                    # The file was deleted or moved; allow downloading it again.
+                    del self._entries[key]
+                    continue
+                return True
+        return False
+
+    def contains_options(self, options) -> bool:
+        info = options.info.info if options.info else None
+        if info and info.get("id"):
+            return self.contains(info.get("extractor_key"), info["id"], options.quality)
+        resolved = resolve_id(options.url)
+        return bool(resolved) and self.contains(resolved[0], resolved[1], options.quality)
+
+    def add(self, extractor: str, video_id: str, qualities, path: str = ""):
+        if not video_id or (extractor or "").lower() in UNTRACKED_EXTRACTORS:
+            return
+        lines = []
+        with self._lock:
+            for quality in dict.fromkeys(q for q in qualities if q):
+                key = archive_key(extractor, video_id, quality)
+                self._entries[key] = path
+                lines.append("\t".join(key + (path,)) + "\n")
+            if not lines:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def rebuild(self, output_dir: str) -> int:
+        # Replaces the index with what is actually on disk; recorded entries whose file still
+        # exists keep their extractor and quality.
+        scanned = {}
+        for root, _dirs, files in os.walk(output_dir):
+            for name in files:
+                match = FILENAME_ID_RE.search(name)
+                if match:
+                    scanned[os.path.join(root, name)] = match.group(1)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            found = {key: path for key, path in self._entries.items() if path and os.path.exists(path)}
+            known = set(found.values())
+            for path, video_id in scanned.items():
+                if path not in known:
+                    found[archive_key(ANY, video_id, ANY)] = path
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, path in found.items():
+                    f.write("\t".join(key + (path,)) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._entries = found
+        return len(found)
@@ -0,0 +1,145 @@
+import threading
+import time
+from dataclasses import dataclass
+
+# Each priority step multiplies a job's share by this factor.
+PRIORITY_FACTOR = 4.0
+MIN_PRIORITY = -2
+MAX_PRIORITY = 2
+# Bucket depth in seconds of the job's rate; keeps bursts short so the cap holds over ~1 s windows.
+BURST_SECONDS = 0.5
+SCHEDULE_RECHECK = 5.0
+MAX_WAIT = 0.25
+
+
+def parse_schedule(rules):
+    # [{"start": "08:00", "end": "17:00", "limit_mbps": 2.5}, ...]; windows may wrap past midnight.
+    parsed = []
+    for rule in rules or []:
+        try:
+            start_h, start_m = (int(part) for part in rule["start"].split(":"))
+            end_h, end_m = (int(part) for part in rule["end"].split(":"))
+            limit = float(rule.get("limit_mbps") or 0) * 1_000_000
+        except (KeyError, ValueError, AttributeError):
+            continue
+        parsed.append((start_h * 60 + start_m, end_h * 60 + end_m, limit))
+    return parsed
+
+
+@dataclass
+class _Allocation:
+    weight: float = 1.0
+    priority: int = 0
+    paused: bool = False
+    rate: float = 0.0
+    tokens: float = 0.0
+    updated: float = 0.0
+    consumed: int = 0
+
+
+class BandwidthManager:
+    # Process-wide token buckets: the global cap (or the active schedule window) is split between
+    # active jobs by weight * PRIORITY_FACTOR ** priority and re-split whenever the set changes.
+    def __init__(self, limit: float = 0, schedule=None):
+        self._cond = threading.Condition()
+        self._base_limit = float(limit or 0)
+        self._schedule = parse_schedule(schedule)
+        self._limit = self._base_limit
+        self._checked_at = 0.0
+        self._jobs = {}
+
+    def configure(self, limit: float = None, schedule=None):
+        with self._cond:
+            if limit is not None:
+                self._base_limit = float(limit or 0)
+            if schedule is not None:
+                self._schedule = parse_schedule(schedule)
+            self._checked_at = 0.0
+            self._refresh_limit(time.monotonic())
+
+    def register(self, key, weight: float = 1.0, priority: int = 0):
+        with self._cond:
+            now = time.monotonic()
+            self._jobs[key] = _Allocation(weight=weight, priority=priority, updated=now)
+            self._reallocate()
+
+    def unregister(self, key):
+        with self._cond:
+            if self._jobs.pop(key, None) is not None:
+                self._reallocate()
+
+    def update(self, key, weight: float = None, priority: int = None, paused: bool = None):
+        with self._cond:
+            allocation = self._jobs.get(key)
+            if allocation is None:
+                return
+            if weight is not None:
+                allocation.weight = max(0.01, float(weight))
+            if priority is not None:
+                allocation.priority = max(MIN_PRIORITY, min(MAX_PRIORITY, int(priority)))
+            if paused is not None:
+                allocation.paused = paused
+            self._reallocate()
+
+    def consume(self, key, nbytes: int):
+        if nbytes <= 0:
+            return
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now - self._checked_at >= SCHEDULE_RECHECK:
+                    self._refresh_limit(now)
+                allocation = self._jobs.get(key)
+                if allocation is None or not self._limit:
+                    if allocation is not None:
+                        allocation.consumed += nbytes
+                    return
+                if allocation.rate <= 0:
+                    # Paused in the manager: hold the transfer until a share is assigned again.
+                    self._cond.wait(MAX_WAIT)
+                    continue
+                allocation.tokens = min(
+                    allocation.tokens + (now - allocation.updated) * allocation.rate,
+                    max(allocation.rate * BURST_SECONDS, nbytes),
+                )
+                allocation.updated = now
+                if allocation.tokens >= nbytes:
+                    allocation.tokens -= nbytes
+                    allocation.consumed += nbytes
+                    return
+                # Woken early by _reallocate() so a freed share is used immediately.
+                self._cond.wait(min((nbytes - allocation.tokens) / allocation.rate, MAX_WAIT))
+
+    def allocations(self) -> dict:
+        with self._cond:
+            return {key: allocation.rate for key, allocation in self._jobs.items()}
+
+    @property
+    def limit(self) -> float:
+        with self._cond:
+            return self._limit
+
+    def _refresh_limit(self, now: float):
+        self._checked_at = now
+        limit = self._base_limit
+        local = time.localtime()
+        minute = local.tm_hour * 60 + local.tm_min
+        for start, end, rule_limit in self._schedule:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                limit = rule_limit
+                break
+        if limit != self._limit:
+            self._limit = limit
+            self._reallocate()
+
+    def _reallocate(self):
+        active = {key: a for key, a in self._jobs.items() if not a.paused}
+        shares = {key: a.weight * PRIORITY_FACTOR ** a.priority for key, a in active.items()}
+        total = sum(shares.values())
+        for key, allocation in self._jobs.items():
+            if key in active and self._limit and total:
+                allocation.rate = self._limit * shares[key] / total
+            else:
+                allocation.rate = 0.0
+        self._cond.notify_all()
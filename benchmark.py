@@ -0,0 +1,438 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from downloader import AnalyzedInfo, Downloader, DownloadOptions, ffmpeg_location, load_yt_dlp
+
+SEGMENT_SECONDS = 1
+SEND_CHUNK = 64 * 1024
+MEDIA_DURATION = 20
+
+# Scenario -> (manifest path, format ids with ffmpeg, format ids without ffmpeg).
+SCENARIOS = {
+    "progressive": ("/progressive.mp4", None, None),
+    "dash": ("/manifest.mpd", "video+audio", "video"),
+}
+
+# Server settings that must match for two result files to be comparable.
+CONFIG_KEYS = ("latency_ms", "bandwidth_mbps", "error_rate", "seed")
+
+
+class FakeMedia:
+    # Deterministic payloads: real MP4/M4A made by ffmpeg when available (so the merge step can be
+    # measured), otherwise seeded random bytes of the same size. DASH segments are byte slices of the
+    # same files, so the concatenated fragments are identical to the progressive download.
+    def __init__(self, video_mb: float, audio_mb: float, seed: int, workdir: str):
+        self.seed = seed
+        self.real = False
+        ffmpeg = ffmpeg_location()
+        if ffmpeg:
+            self.video, self.audio = self._encode(ffmpeg, video_mb, audio_mb, workdir)
+            self.real = bool(self.video and self.audio)
+        if not self.real:
+            rng = random.Random(seed)
+            self.video = rng.randbytes(int(video_mb * 1024 * 1024))
+            self.audio = rng.randbytes(int(audio_mb * 1024 * 1024))
+        self.video_segments = self._split(self.video)
+        self.audio_segments = self._split(self.audio)
+
+    def _encode(self, ffmpeg, video_mb, audio_mb, workdir):
+        video_path = os.path.join(workdir, "video.mp4")
+        audio_path = os.path.join(workdir, "audio.m4a")
+        video_rate = int(video_mb * 8 * 1024 * 1024 / MEDIA_DURATION)
+        audio_rate = max(32_000, int(audio_mb * 8 * 1024 * 1024 / MEDIA_DURATION))
+        commands = [
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={MEDIA_DURATION}",
+             "-c:v", "mpeg4", "-b:v", str(video_rate), "-movflags", "+faststart", video_path],
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=440:duration={MEDIA_DURATION}",
+             "-c:a", "aac", "-b:a", str(audio_rate), audio_path],
+        ]
+        try:
+            for command in commands:
+                subprocess.run(command, check=True, capture_output=True)
+            with open(video_path, "rb") as f:
+                video = f.read()
+            with open(audio_path, "rb") as f:
+                audio = f.read()
+            return video, audio
+        except (OSError, subprocess.CalledProcessError):
+            return None, None
+
+    def _split(self, data: bytes):
+        count = MEDIA_DURATION // SEGMENT_SECONDS
+        size = -(-len(data) // count)
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def manifest(self) -> str:
+        def representation(kind, rep_id, mime, extra, segments, bandwidth):
+            urls = "".join(f'<SegmentURL media="{kind}/seg-{i}"/>' for i in range(len(segments)))
+            return (
+                f'<AdaptationSet mimeType="{mime}" contentType="{kind}">'
+                f'<Representation id="{rep_id}" bandwidth="{bandwidth}" {extra}>'
+                f'<SegmentList timescale="1" duration="{SEGMENT_SECONDS}">{urls}</SegmentList>'
+                f"</Representation></AdaptationSet>"
+            )
+
+        video_bw = len(self.video) * 8 // MEDIA_DURATION
+        audio_bw = len(self.audio) * 8 // MEDIA_DURATION
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" '
+            f'mediaPresentationDuration="PT{MEDIA_DURATION}S" minBufferTime="PT2S" '
+            'profiles="urn:mpeg:dash:profile:isoff-main:2011"><Period>'
+            + representation("video", "video", "video/mp4", 'width="1280" height="720" codecs="mp4v.20.9"',
+                             self.video_segments, video_bw)
+            + representation("audio", "audio", "audio/mp4", 'codecs="mp4a.40.2" audioSamplingRate="44100"',
+                             self.audio_segments, audio_bw)
+            + "</Period></MPD>"
+        )
+
+    def info_dict(self, base_url: str) -> dict:
+        # What analyze() would return for /manifest.mpd, built without touching the network.
+        def fmt(kind, segments, ext, extra):
+            return dict(
+                format_id=kind,
+                url=f"{base_url}/manifest.mpd",
+                manifest_url=f"{base_url}/manifest.mpd",
+                fragment_base_url=f"{base_url}/",
+                fragments=[{"path": f"{kind}/seg-{i}", "duration": SEGMENT_SECONDS} for i in range(len(segments))],
+                protocol="http_dash_segments",
+                ext=ext,
+                filesize=sum(len(s) for s in segments),
+                **extra,
+            )
+
+        return {
+            "id": f"bench-{self.seed}",
+            "title": f"bench-{self.seed}",
+            "extractor": "generic",
+            "extractor_key": "Generic",
+            "webpage_url": f"{base_url}/manifest.mpd",
+            "duration": MEDIA_DURATION,
+            "formats": [
+                fmt("video", self.video_segments, "mp4",
+                    {"vcodec": "mp4v.20.9", "acodec": "none", "width": 1280, "height": 720, "container": "mp4_dash"}),
+                fmt("audio", self.audio_segments, "m4a",
+                    {"vcodec": "none", "acodec": "mp4a.40.2", "container": "m4a_dash"}),
+            ],
+        }
+
+
+class FakeMediaServer:
+    # Local stand-in for a video CDN: first-byte latency, per-connection bandwidth and a seeded
+    # fraction of media requests answered with HTTP 503 (manifests are never failed).
+    def __init__(self, media: FakeMedia, latency_ms: float = 0, bandwidth_mbps: float = 0, error_rate: float = 0):
+        self.media = media
+        self.latency = latency_ms / 1000
+        self.bandwidth = bandwidth_mbps * 1_000_000
+        self.error_rate = error_rate
+        self._rng = random.Random(media.seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _resolve(self, path: str):
+        path = path.split("?", 1)[0]
+        if path == "/manifest.mpd":
+            return self.media.manifest().encode(), "application/dash+xml", False
+        if path == "/progressive.mp4":
+            return self.media.video, "video/mp4", True
+        for kind, segments in (("video", self.media.video_segments), ("audio", self.media.audio_segments)):
+            prefix = f"/{kind}/seg-"
+            if path.startswith(prefix) and path[len(prefix):].isdigit():
+                index = int(path[len(prefix):])
+                if index < len(segments):
+                    return segments[index], "video/mp4" if kind == "video" else "audio/mp4", True
+        return None, "", False
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(head=True)
+
+            def do_GET(self):
+                self._respond(head=False)
+
+            def _respond(self, head: bool):
+                body, content_type, media = server._resolve(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                if media and server._should_fail():
+                    self.send_error(503)
+                    return
+                start, end = 0, len(body) - 1
+                range_header = self.headers.get("Range", "")
+                if range_header.startswith("bytes="):
+                    first, _, last = range_header[6:].split(",")[0].partition("-")
+                    start = int(first or 0)
+                    end = min(int(last), end) if last else end
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                if not head:
+                    self._send(memoryview(body)[start:end + 1])
+
+            def _send(self, data):
+                started = time.perf_counter()
+                sent = 0
+                try:
+                    for offset in range(0, len(data), SEND_CHUNK):
+                        chunk = data[offset:offset + SEND_CHUNK]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if server.bandwidth:
+                            ahead = sent / server.bandwidth - (time.perf_counter() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                with server._lock:
+                    server.bytes_sent += sent
+
+        return Handler
+
+
+class HookTimer:
+    # Wraps Downloader._progress_hook to measure its cost, the first received byte and the end of the
+    # last stream (everything after that until download() returns is merge / post-processing).
+    def __init__(self, downloader: Downloader):
+        self._hook = downloader._progress_hook
+        downloader._progress_hook = self
+        self.calls = 0
+        self.seconds = 0.0
+        self.first_byte_at = None
+        self.last_finished_at = None
+
+    def __call__(self, data):
+        started = time.perf_counter()
+        if self.first_byte_at is None and (data.get("downloaded_bytes") or 0) > 0:
+            self.first_byte_at = started
+        try:
+            self._hook(data)
+        finally:
+            finished = time.perf_counter()
+            self.calls += 1
+            self.seconds += finished - started
+            if data.get("status") == "finished":
+                self.last_finished_at = finished
+
+
+def run_scenario(name: str, server: FakeMediaServer, media: FakeMedia, workdir: str, use_info: bool) -> dict:
+    path, merged_ids, single_ids = SCENARIOS[name]
+    url = server.base_url + path
+    downloader = Downloader()
+
+    started = time.perf_counter()
+    if use_info and name == "dash":
+        info = media.info_dict(server.base_url)
+        analysis = {"info": AnalyzedInfo(info=info, expires_at=time.time() + 3600)}
+    else:
+        analysis = downloader.analyze(url)
+    analyze_s = time.perf_counter() - started
+
+    if name == "progressive":
+        format_ids = analysis["info"].info["formats"][0]["format_id"]
+    else:
+        format_ids = merged_ids if media.real else single_ids
+    output_dir = tempfile.mkdtemp(dir=workdir)
+    options = DownloadOptions(
+        url=url, output_dir=output_dir, quality="auto", fmt="mp4", info=analysis["info"], format_ids=format_ids
+    )
+
+    timer = HookTimer(downloader)
+    bytes_before = server.bytes_sent
+    started = time.perf_counter()
+    downloader.download(options)
+    finished = time.perf_counter()
+    elapsed = finished - started
+    received = server.bytes_sent - bytes_before
+    merge_s = finished - timer.last_finished_at if "+" in format_ids and timer.last_finished_at else None
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return {
+        "analyze_ms": analyze_s * 1000,
+        "download_s": elapsed,
+        "throughput_mbps": received / elapsed / 1_000_000 if elapsed else 0.0,
+        "ttfb_ms": (timer.first_byte_at - started) * 1000 if timer.first_byte_at else None,
+        "hook_calls": timer.calls,
+        "hook_us_per_call": timer.seconds / timer.calls * 1_000_000 if timer.calls else 0.0,
+        "hook_overhead_pct": timer.seconds / elapsed * 100 if elapsed else 0.0,
+        "merge_ms": merge_s * 1000 if merge_s is not None else None,
+        "fragment_concurrency": downloader.stats.get("fragment_concurrency"),
+        "retries": downloader.stats.get("retries"),
+        "bytes": received,
+    }
+
+
+def summarize(runs):
+    # Medians are robust to the odd slow run; comparisons between commits use these.
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = statistics.median(values) if values else None
+    return summary
+
+
+def git_revision() -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+        return proc.stdout.strip()
+    except OSError:
+        return ""
+
+
+def format_value(value, unit=""):
+    if value is None:
+        return "-"
+    return f"{value:.1f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+
+
+def print_results(results: dict, baseline: dict = None):
+    print(f"Benchmark {results['revision'] or '(brak git)'}, yt-dlp {results['yt_dlp']}, "
+          f"ffmpeg: {'tak' if results['media']['real'] else 'nie (bez scalania)'}")
+    print(f"Serwer: opoznienie {results['server']['latency_ms']} ms, pasmo {results['server']['bandwidth_mbps'] or 'bez limitu'} MB/s, "
+          f"bledy {results['server']['error_rate'] * 100:.0f}% "
+          f"({results['server']['injected_errors']} z {results['server']['requests']} zadan)")
+    if baseline and {k: baseline["server"].get(k) for k in CONFIG_KEYS} != {k: results["server"][k] for k in CONFIG_KEYS}:
+        print(f"UWAGA: {baseline['revision']} mierzono z inna konfiguracja serwera, wyniki nie sa porownywalne.")
+    columns = [
+        ("analyze_ms", "analiza", " ms"),
+        ("download_s", "pobieranie", " s"),
+        ("throughput_mbps", "transfer", " MB/s"),
+        ("ttfb_ms", "TTFB", " ms"),
+        ("hook_us_per_call", "hook", " us"),
+        ("hook_overhead_pct", "hook", "%"),
+        ("merge_ms", "scalanie", " ms"),
+        ("fragment_concurrency", "fragmenty", ""),
+        ("retries", "ponowienia", ""),
+    ]
+    for name, summary in results["scenarios"].items():
+        print(f"\n{name} (mediana z {results['repeat'] - summary['failed']}, nieudane: {summary['failed']}):")
+        for error in summary["errors"]:
+            print(f"  blad: {error}")
+        old = (baseline or {}).get("scenarios", {}).get(name, {})
+        for key, label, unit in columns:
+            line = f"  {label:<11} {format_value(summary.get(key), unit):>14}"
+            if old.get(key) and summary.get(key) is not None:
+                line += f"  ({(summary[key] - old[key]) / old[key] * 100:+.1f}% vs {baseline['revision']})"
+            print(line)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark Downloader na lokalnym serwerze (bez sieci).")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="domyslnie wszystkie")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--video-mb", type=float, default=32.0)
+    parser.add_argument("--audio-mb", type=float, default=2.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="opoznienie przed pierwszym bajtem")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0.0, help="pasmo na polaczenie, 0 = bez limitu")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="ulamek zadan mediow konczonych HTTP 503")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--use-info", action="store_true", help="dash: gotowy info dict zamiast analizy manifestu")
+    parser.add_argument("--json", help="zapisz wyniki do pliku JSON")
+    parser.add_argument("--compare", help="porownaj z wczesniejszym plikiem JSON")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    scenarios = args.scenario or list(SCENARIOS)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    yt_dlp = load_yt_dlp()
+    workdir = tempfile.mkdtemp(prefix="yt-bench-")
+    try:
+        media = FakeMedia(args.video_mb, args.audio_mb, args.seed, workdir)
+        results = {
+            "revision": git_revision(),
+            "yt_dlp": yt_dlp.version.__version__,
+            "python": sys.version.split()[0],
+            "repeat": args.repeat,
+            "media": {"real": media.real, "video_bytes": len(media.video), "audio_bytes": len(media.audio)},
+            "server": {
+                "latency_ms": args.latency_ms,
+                "bandwidth_mbps": args.bandwidth_mbps,
+                "error_rate": args.error_rate,
+                "seed": args.seed,
+            },
+            "scenarios": {},
+        }
+        with FakeMediaServer(media, args.latency_ms, args.bandwidth_mbps, args.error_rate) as server:
+            for name in scenarios:
+                runs, failures = [], []
+                for _ in range(args.repeat):
+                    try:
+                        runs.append(run_scenario(name, server, media, workdir, args.use_info))
+                    except Exception as exc:
+                        failures.append(" ".join(str(exc).split())[:200])
+                results["scenarios"][name] = summarize(runs) if runs else {}
+                results["scenarios"][name]["failed"] = len(failures)
+                results["scenarios"][name]["errors"] = sorted(set(failures))
+            results["server"]["requests"] = server.requests
+            results["server"]["injected_errors"] = server.errors
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from cache import MetadataCache
+from downloader import Downloader, load_yt_dlp
+from sessions import SessionPool
+
+# Extraction is partly CPU-bound (player JS, signature deciphering) and partly waiting on the
+# network, so a few more processes than cores still pay off.
+DEFAULT_MAX_PROCS = max(2, min(8, os.cpu_count() or 2))
+# URLs handed to the pool ahead of the free workers; keeps results streaming and cancel quick.
+PREFETCH_PER_PROC = 2
+
+# Set in each worker process by _init_worker().
+_worker = None
+
+
+def _init_worker(use_cache: bool):
+    global _worker
+    load_yt_dlp()
+    # One long-lived YoutubeDL per process keeps the player JS it has already fetched.
+    _worker = Downloader(cache=MetadataCache() if use_cache else None, sessions=SessionPool(size=1))
+
+
+def _analyze(url: str):
+    started = time.perf_counter()
+    try:
+        result = _worker.analyze(url)
+        error = ""
+    except RuntimeError as exc:
+        # analyze() already mapped yt-dlp's message.
+        result, error = None, str(exc)
+    except Exception as exc:
+        result, error = None, _worker._normalize_error(str(exc)) or type(exc).__name__
+    return result, error, time.perf_counter() - started
+
+
+@dataclass
+class BulkResult:
+    url: str
+    # Same dict as Downloader.analyze(); None when the URL failed.
+    result: dict = None
+    error: str = ""
+    elapsed_s: float = 0.0
+
+
+class BulkAnalyzer:
+    # Analyzes many URLs in parallel worker processes. run() yields a BulkResult per URL in
+    # completion order; a failing or crashing URL only affects its own result.
+    def __init__(self, max_procs: int = DEFAULT_MAX_PROCS, use_cache: bool = True):
+        self.max_procs = max(1, int(max_procs))
+        self.use_cache = use_cache
+        self._lock = threading.Lock()
+        self._pool = None
+        self._cancelled = False
+
+    def _start_pool(self):
+        # Imported here so the GUI does not pay for multiprocessing at startup.
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # "spawn" everywhere: forking a process that runs Tk and worker threads is not safe.
+        return ProcessPoolExecutor(
+            max_workers=self.max_procs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.use_cache,),
+        )
+
+    def run(self, urls):
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from concurrent.futures.process import BrokenProcessPool
+
+        pending = deque(dict.fromkeys(url.strip() for url in urls if url.strip()))
+        in_flight = {}
+        with self._lock:
+            self._cancelled = False
+            self._pool = self._start_pool() if pending else None
+        try:
+            while (in_flight or pending) and not self._cancelled:
+                with self._lock:
+                    while pending and not self._cancelled and len(in_flight) < self.max_procs * PREFETCH_PER_PROC:
+                        url = pending.popleft()
+                        in_flight[self._pool.submit(_analyze, url)] = url
+                if not in_flight:
+                    break
+                # Short timeout so a cancel() is noticed without waiting for a slow extraction.
+                done, _not_done = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    url = in_flight.pop(future)
+                    if future.cancelled():
+                        continue
+                    try:
+                        result, error, elapsed = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        result, error, elapsed = None, "Proces analizy zakonczyl sie nieoczekiwanie.", 0.0
+                    except Exception as exc:
+                        result, error, elapsed = None, str(exc), 0.0
+                    yield BulkResult(url=url, result=result, error=error, elapsed_s=elapsed)
+                if broken and not self._cancelled:
+                    # A crashed worker takes the whole pool down; the in-flight URLs fail with it
+                    # and the rest continue on a fresh pool.
+                    for url in in_flight.values():
+                        yield BulkResult(url=url, error="Proces analizy zakonczyl sie nieoczekiwanie.")
+                    in_flight.clear()
+                    with self._lock:
+                        self._pool.shutdown(wait=False, cancel_futures=True)
+                        self._pool = self._start_pool()
+        finally:
+            with self._lock:
+                pool, self._pool = self._pool, None
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def cancel(self):
+        # URLs already being extracted finish in the background; their results are dropped.
+        with self._lock:
+            self._cancelled = True
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
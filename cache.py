@@ -0,0 +1,159 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from settings import CACHE_FILE
+
+METADATA_TTL = 7 * 24 * 3600
+# Signed stream URLs are never trusted for longer than this, even if they state a later expiry.
+STREAM_URL_TTL = 5 * 3600
+MAX_ENTRIES = 1000
+MAX_BYTES = 64 * 1024 * 1024
+
+# Large fields that analyze()/download() never read.
+DROPPED_INFO_KEYS = (
+    "automatic_captions",
+    "subtitles",
+    "thumbnails",
+    "heatmap",
+    "chapters",
+    "description",
+    "tags",
+    "categories",
+)
+
+YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+YOUTUBE_PATH_RE = re.compile(r"^/(?:shorts|embed|live|v)/([0-9A-Za-z_-]{11})")
+YOUTUBE_ID_RE = re.compile(r"^[0-9A-Za-z_-]{11}$")
+
+
+def canonical_key(url: str) -> str:
+    # Cheap local parsing; no extractor lookup so the cache can be checked before yt-dlp is involved.
+    url = url.strip()
+    parsed = urlparse(url if "://" in url else "https://" + url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www.") or host.startswith("m."):
+        host = host.split(".", 1)[1]
+    if host.startswith("music."):
+        host = host[len("music."):]
+    if host in YOUTUBE_HOSTS:
+        video_id = ""
+        if host == "youtu.be":
+            video_id = parsed.path.strip("/").split("/")[0]
+        elif parsed.path == "/watch":
+            video_id = (parse_qs(parsed.query).get("v") or [""])[0]
+        else:
+            match = YOUTUBE_PATH_RE.match(parsed.path)
+            if match:
+                video_id = match.group(1)
+        if YOUTUBE_ID_RE.match(video_id):
+            return f"youtube:{video_id}"
+    return "url:" + url.split("#", 1)[0]
+
+
+def trim_info(info: dict) -> dict:
+    return {key: value for key, value in info.items() if key not in DROPPED_INFO_KEYS}
+
+
+class MetadataCache:
+    def __init__(self, path=CACHE_FILE, metadata_ttl=METADATA_TTL, stream_url_ttl=STREAM_URL_TTL,
+                 max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.metadata_ttl = metadata_ttl
+        self.stream_url_ttl = stream_url_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " info TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " urls_expire_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers proceed while another thread or process writes.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, url: str):
+        key = canonical_key(url)
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT result, info, created_at, urls_expire_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            result, info, created_at, urls_expire_at = row
+            with conn:
+                if created_at + self.metadata_ttl < now:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            return None
+        result = json.loads(result)
+        result["url"] = url
+        result["cached"] = True
+        if urls_expire_at > now:
+            result["info"] = json.loads(info)
+            result["expires_at"] = urls_expire_at
+        return result
+
+    def put(self, url: str, result: dict, info: dict, expires_at: float):
+        now = time.time()
+        result_json = json.dumps(
+            {"title": result.get("title") or "", "available_qualities": result.get("available_qualities") or []},
+            ensure_ascii=False,
+        )
+        info_json = json.dumps(trim_info(info), ensure_ascii=False)
+        expires_at = min(expires_at, now + self.stream_url_ttl)
+        try:
+            with self._write_lock, self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (canonical_key(url), result_json, info_json, now, expires_at, now,
+                     len(result_json) + len(info_json)),
+                )
+                self._evict(conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection):
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC) AS total FROM entries)"
+            " WHERE total > ?)",
+            (self.max_bytes,),
+        )
+
+    def invalidate(self, url: str):
+        try:
+            with self._write_lock, self._connect() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (canonical_key(url),))
+        except sqlite3.Error:
+            pass
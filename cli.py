@@ -0,0 +1,293 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from archive import DownloadArchive
+from bandwidth import BandwidthManager
+from cache import MetadataCache
+from downloader import DownloadOptions
+from formats import FormatPolicy
+from history import DownloadHistory
+from jobs import JobQueue, STATE_LABELS, FINISHED_STATES, DONE
+from journal import JobJournal
+from logview import file_logger
+from metrics import MetricsExporter
+from postprocess import PostProcessor
+from retry import RetryPolicy
+from sessions import SessionPool
+from settings import SettingsStore, MAX_WORKERS_LIMIT
+
+DEFAULT_SOCKET = "/run/yt-video-download/daemon.sock"
+DEFAULT_PORT = 8799
+SPOOL_POLL_INTERVAL = 2.0
+
+log = logging.getLogger("yt_video_download.cli")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-video-download",
+        description="Pobieranie wideo bez interfejsu graficznego (CLI / demon).",
+    )
+    parser.add_argument("urls", nargs="*", help="linki do pobrania")
+    parser.add_argument("-f", "--file", help="plik z linkami (jeden w linii)")
+    parser.add_argument("-o", "--output", help="folder zapisu (domyslnie z settings.json)")
+    parser.add_argument("--staging", help="szybki lokalny folder na pliki tymczasowe (domyslnie z settings.json)")
+    parser.add_argument("-q", "--quality", default="auto", help="jakosc, np. 1080p (domyslnie auto)")
+    parser.add_argument("-w", "--workers", type=int, help="liczba rownoczesnych pobieran")
+    parser.add_argument("--limit", type=float, help="globalny limit pasma w MB/s (domyslnie z settings.json)")
+    parser.add_argument("--playlist", action="store_true", help="pobierz cala playliste / kanal")
+    parser.add_argument("--rebuild-archive", action="store_true", help="odbuduj archiwum pobranych z folderu zapisu")
+    parser.add_argument("--resume", action="store_true", help="wznow przerwane pobierania z dziennika")
+    parser.add_argument("--export-history", metavar="CSV", help="zapisz historie pobieran do pliku CSV")
+    parser.add_argument("--daemon", action="store_true", help="dzialaj jako demon i przyjmuj zadania")
+    parser.add_argument("--socket", help=f"gniazdo Unix dla demona (np. {DEFAULT_SOCKET})")
+    parser.add_argument("--port", type=int, help="port TCP na 127.0.0.1 dla demona (zamiast gniazda Unix)")
+    parser.add_argument("--metrics-port", type=int, help="metryki Prometheus na 127.0.0.1:PORT/metrics")
+    parser.add_argument("--spool", help="katalog kolejki: pliki *.txt z linkami sa pobierane i przenoszone do done/")
+    return parser
+
+
+def read_url_file(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class HeadlessRunner:
+    def __init__(self, output_dir: str, quality: str, workers: int, bandwidth=None, metrics_port: int = 0,
+                 format_policy=None, staging_dir: str = ""):
+        self.output_dir = output_dir
+        self.quality = quality
+        self.jobs = JobQueue(
+            max_workers=workers,
+            on_update=self._on_update,
+            on_log=self._on_log,
+            cache=MetadataCache(),
+            sessions=SessionPool(),
+            journal=JobJournal(),
+            archive=DownloadArchive(),
+            metrics=MetricsExporter(port=metrics_port),
+            postprocess=PostProcessor(),
+            bandwidth=bandwidth,
+            format_policy=format_policy,
+            history=DownloadHistory(),
+            staging_dir=staging_dir,
+            retry=RetryPolicy(),
+        )
+        self._file_log = file_logger()
+        self._states = {}
+        self.stop_event = threading.Event()
+        self._stop_started = 0.0
+
+    def start(self):
+        self.jobs.start()
+
+    def submit(self, url: str, quality: str = None, playlist: bool = False, output_dir: str = None,
+               weight: float = None):
+        options = DownloadOptions(
+            url=url,
+            output_dir=output_dir or self.output_dir,
+            quality=quality or self.quality,
+            fmt="mp4",
+        )
+        if playlist:
+            self.jobs.enqueue_playlist(options)
+            return None
+        job = self.jobs.enqueue(options)
+        if weight is not None:
+            self.jobs.set_weight(job.id, weight)
+        return job.id
+
+    def submit_line(self, line: str):
+        # A spool/socket line is either a bare URL or a JSON object:
+        # {"url", "quality", "playlist", "output_dir", "weight"}.
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return None
+        if line.startswith("{"):
+            data = json.loads(line)
+            return self.submit(
+                data["url"],
+                quality=data.get("quality"),
+                playlist=bool(data.get("playlist")),
+                output_dir=data.get("output_dir"),
+                weight=data.get("weight"),
+            )
+        return self.submit(line)
+
+    def wait(self) -> bool:
+        while not self.stop_event.is_set():
+            if not self.jobs.has_active() and self.jobs.is_idle():
+                break
+            time.sleep(0.5)
+        return all(job.state == DONE for job in self.jobs.jobs())
+
+    def stop(self):
+        self._stop_started = time.perf_counter()
+        self.stop_event.set()
+        self.jobs.shutdown()
+
+    def wait_stopped(self):
+        # Interrupted jobs unwind before exit, so their partial files and journal entries are consistent.
+        while not self.jobs.is_idle():
+            time.sleep(0.05)
+        if self._stop_started:
+            log.info("Pobierania zatrzymane po %.2fs", time.perf_counter() - self._stop_started)
+
+    def close(self):
+        # Commits history rows still waiting in the writer's queue.
+        self.jobs.history.close()
+
+    def status(self) -> dict:
+        return {STATE_LABELS[state]: count for state, count in self.jobs.counts().items()}
+
+    def _on_update(self, job):
+        # Progress ticks are frequent; only state transitions are printed.
+        if self._states.get(job.id) != job.state:
+            self._states[job.id] = job.state
+            log.info("[%s] %s: %s", job.id, STATE_LABELS.get(job.state, job.state), job.label)
+        if job.state in FINISHED_STATES:
+            self._states.pop(job.id, None)
+
+    def _on_log(self, job, message):
+        line = message if job is None else f"[{job.id}] {message}"
+        log.info(line)
+        self._file_log.info(line)
+
+
+def serve_spool(runner: HeadlessRunner, spool_dir: str):
+    done_dir = os.path.join(spool_dir, "done")
+    os.makedirs(done_dir, exist_ok=True)
+    while not runner.stop_event.is_set():
+        for name in sorted(os.listdir(spool_dir)):
+            path = os.path.join(spool_dir, name)
+            if not name.endswith(".txt") or not os.path.isfile(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+                for line in lines:
+                    runner.submit_line(line)
+            except Exception as exc:
+                log.error("Blad pliku kolejki %s: %s", name, exc)
+            os.replace(path, os.path.join(done_dir, name))
+        runner.stop_event.wait(SPOOL_POLL_INTERVAL)
+
+
+def _handle_client(runner: HeadlessRunner, conn: socket.socket):
+    with conn, conn.makefile("rw", encoding="utf-8", newline="\n") as stream:
+        for line in stream:
+            command = line.strip()
+            try:
+                if command == "status":
+                    reply = "OK " + json.dumps(runner.status(), ensure_ascii=False)
+                else:
+                    job_id = runner.submit_line(command)
+                    reply = "OK" if job_id is None else f"OK {job_id}"
+            except Exception as exc:
+                reply = f"ERR {exc}"
+            stream.write(reply + "\n")
+            stream.flush()
+
+
+def serve_socket(runner: HeadlessRunner, socket_path: str = None, port: int = None):
+    if port is not None or not hasattr(socket, "AF_UNIX"):
+        server = socket.create_server(("127.0.0.1", port or DEFAULT_PORT))
+        log.info("Demon nasluchuje na 127.0.0.1:%s", port or DEFAULT_PORT)
+    else:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        server.listen()
+        log.info("Demon nasluchuje na %s", socket_path)
+    server.settimeout(1.0)
+    with server:
+        while not runner.stop_event.is_set():
+            try:
+                conn, _addr = server.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(target=_handle_client, args=(runner, conn), daemon=True).start()
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stdout)
+
+    settings = SettingsStore().load()
+    workers = max(1, min(args.workers or settings.max_workers, MAX_WORKERS_LIMIT))
+    limit_mbps = settings.bandwidth_limit_mbps if args.limit is None else args.limit
+    bandwidth = BandwidthManager(limit=limit_mbps * 1_000_000, schedule=settings.bandwidth_schedule)
+    metrics_port = settings.metrics_port if args.metrics_port is None else args.metrics_port
+    runner = HeadlessRunner(
+        args.output or settings.output_dir,
+        args.quality,
+        workers,
+        bandwidth=bandwidth,
+        metrics_port=metrics_port,
+        format_policy=FormatPolicy.from_settings(settings),
+        staging_dir=settings.staging_dir if args.staging is None else args.staging,
+    )
+    runner.start()
+
+    def _stop(signum, _frame):
+        log.info("Zatrzymywanie (sygnal %s)...", signum)
+        runner.stop()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    urls = list(args.urls)
+    if args.file:
+        urls.extend(read_url_file(args.file))
+    if args.rebuild_archive:
+        count = runner.jobs.archive.rebuild(runner.output_dir)
+        log.info("Archiwum odbudowane, pozycji: %s", count)
+    if args.export_history:
+        count = runner.jobs.history.export_csv(args.export_history)
+        log.info("Historia zapisana do %s, pozycji: %s", args.export_history, count)
+    for url in urls:
+        runner.submit(url, playlist=args.playlist)
+    if args.resume:
+        restored = runner.jobs.restore(runner.jobs.journal.entries())
+        log.info("Wznowione z dziennika: %s", len(restored))
+
+    if not args.daemon:
+        if not urls and not args.resume:
+            if args.rebuild_archive or args.export_history:
+                return 0
+            build_parser().print_usage()
+            return 2
+        ok = runner.wait()
+        runner.wait_stopped()
+        runner.close()
+        return 0 if ok else 1
+
+    servers = []
+    if args.spool:
+        servers.append(threading.Thread(target=serve_spool, args=(runner, args.spool), daemon=True))
+    if args.socket or args.port is not None or not args.spool:
+        servers.append(
+            threading.Thread(
+                target=serve_socket, args=(runner, args.socket or DEFAULT_SOCKET, args.port), daemon=True
+            )
+        )
+    for server in servers:
+        server.start()
+    while not runner.stop_event.is_set():
+        runner.stop_event.wait(1.0)
+    runner.wait_stopped()
+    runner.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
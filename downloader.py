@@ -1,9 +1,154 @@
+import copy
 import os
+import re
+import shutil
+import socket
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from dataclasses import dataclass
-import yt_dlp
+from urllib.parse import urlparse
+
+import startup
+from formats import FormatIndex
+from fragments import FragmentController, HTTP_CHUNK_SIZE
+from metrics import JobMetrics
+from retry import FRAGMENT_RETRIES, STREAM_RETRIES, STREAM_RETRY_BASE, STREAM_RETRY_CAP, backoff_delay
+from storage import check_free_space, move_file
 
 BASE_DIR = os.path.dirname(__file__)
-FFMPEG_PATH = os.path.join(BASE_DIR, "bin", "ffmpeg.exe")
+FFMPEG_PATH = os.path.join(BASE_DIR, "bin", "ffmpeg.exe" if os.name == "nt" else "ffmpeg")
+
+# Signed stream URLs carry their expiry (YouTube: "expire=<unix time>" in the query or path).
+EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d+)")
+# Used when no format URL states an expiry.
+INFO_TTL = 30 * 60
+EXPIRY_MARGIN = 60
+# Offered in playlist mode, where formats are only known once each entry is resolved.
+STANDARD_QUALITIES = ["2160p", "1440p", "1080p", "720p", "480p", "360p"]
+MAX_PLAYLIST_DEPTH = 3
+THROTTLE_RE = re.compile(r"HTTP Error (403|429)")
+# Longest wait for a server that has not answered yet; cancel() does not wait for it.
+SOCKET_TIMEOUT = 15
+# How often a request waiting for response headers checks for cancel().
+REQUEST_CANCEL_POLL_S = 0.05
+# Upper bound for removing a cancelled job's files, e.g. on a stalled network share.
+CLEANUP_BUDGET_S = 2.0
+
+
+_yt_dlp = None
+_yt_dlp_lock = threading.Lock()
+_warm_thread = None
+
+
+def load_yt_dlp():
+    # yt-dlp and its extractor registry are imported on first use (or by warm_up()),
+    # so the window can appear before they are loaded.
+    global _yt_dlp
+    if _yt_dlp is None:
+        with _yt_dlp_lock:
+            if _yt_dlp is None:
+                import yt_dlp
+
+                startup.mark("yt_dlp imported")
+                yt_dlp.extractor.gen_extractor_classes()
+                startup.mark("yt_dlp extractors loaded")
+                _yt_dlp = yt_dlp
+    return _yt_dlp
+
+
+def is_yt_dlp_loaded() -> bool:
+    return _yt_dlp is not None
+
+
+def warm_up(done_cb=None):
+    global _warm_thread
+    if _warm_thread is None:
+
+        def _run():
+            load_yt_dlp()
+            if done_cb:
+                done_cb()
+
+        _warm_thread = threading.Thread(target=_run, daemon=True)
+        _warm_thread.start()
+    return _warm_thread
+
+
+def _abort_response(response):
+    # close() from another thread waits for the blocked reader and does not wake a recv() on a
+    # silent server; shutting the socket down does. Handlers without a socket are left to time out.
+    try:
+        sock = socket.fromfd(response.fp.fileno(), socket.AF_INET, socket.SOCK_STREAM)
+    except (AttributeError, OSError, ValueError):
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+def _merge_stream(fmt: dict) -> dict:
+    # Stream selection for postprocess.MergeTask, following yt-dlp's FFmpegMergerPP. A codec the
+    # format list leaves unknown is mapped as optional.
+    vcodec, acodec = fmt.get("vcodec"), fmt.get("acodec")
+    return {
+        "video": vcodec != "none",
+        "audio": acodec != "none",
+        "optional": vcodec is None or acodec is None,
+        "adts": (fmt.get("protocol") or "").startswith("m3u8") and (acodec or "").startswith("mp4a"),
+    }
+
+
+def _metadata_args(info: dict) -> list:
+    # Written while the streams are copied anyway, so tagging costs no extra pass over the file.
+    values = {
+        "title": info.get("title"),
+        "artist": info.get("artist") or info.get("uploader"),
+        "date": info.get("upload_date"),
+        "comment": info.get("webpage_url"),
+    }
+    args = []
+    for key, value in values.items():
+        if value:
+            args += ["-metadata", f"{key}={value}"]
+    return args
+
+
+def ffmpeg_location():
+    # The bundled binary always wins; headless Linux installs may rely on the system ffmpeg instead.
+    if os.path.exists(FFMPEG_PATH):
+        return FFMPEG_PATH
+    if os.name != "nt":
+        return shutil.which("ffmpeg")
+    return None
+
+
+class _YtDlpLogger:
+    # Receives yt-dlp's own messages (including fragment retry warnings) for one Downloader.
+    def __init__(self, downloader):
+        self.downloader = downloader
+
+    def debug(self, message):
+        self.downloader._on_ytdlp_message(message)
+
+    info = debug
+    warning = debug
+
+    def error(self, message):
+        self.downloader._on_ytdlp_message(message)
+
+
+@dataclass
+class AnalyzedInfo:
+    info: dict
+    expires_at: float
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
 
 
 @dataclass
@@ -12,78 +157,414 @@ class DownloadOptions:
     output_dir: str
     quality: str
     fmt: str
+    # Result of a previous analyze(); reused instead of extracting the URL again.
+    info: AnalyzedInfo = None
+    # Exact yt-dlp format IDs ("137+140"); chosen from the analysis' format index, or set when resuming
+    # so the same partial files are continued.
+    format_ids: str = ""
 
 
 class Downloader:
-    def __init__(self, progress_cb=None, log_cb=None, status_cb=None):
+    def __init__(self, progress_cb=None, log_cb=None, status_cb=None, cache=None, sessions=None, state_cb=None,
+                 throttle=None, defer_merge=False, format_policy=None, staging_dir=""):
         self.progress_cb = progress_cb
         self.log_cb = log_cb
         self.status_cb = status_cb
+        # Receives resume_state (format IDs, files, fragment counters) for the job journal.
+        self.state_cb = state_cb
+        # Called with the number of newly received bytes; may block to enforce a bandwidth share.
+        self.throttle = throttle
+        # Leave video+audio merges to a separate post-processing stage (see pending_merge).
+        self.defer_merge = defer_merge
+        self.pending_merge = None
+        self._part_format_ids = ""
+        # formats.FormatPolicy used when the options carry no exact format IDs.
+        self.format_policy = format_policy
+        # Optional fast local directory for .part files, fragments and merge intermediates; finished
+        # files are moved into options.output_dir (see storage.move_file).
+        self.staging_dir = staging_dir
+        # Optional cache.MetadataCache and sessions.SessionPool shared between downloaders.
+        self.cache = cache
+        self.sessions = sessions
         self._last_status = ""
         self._cancel_requested = False
-        self._last_filename = ""
-        self._last_tmpfilename = ""
+        self._cancel_event = threading.Event()
+        # Set when a stream answered 403 after its signed URLs expired; the job re-extracts them.
+        self.urls_expired = False
+        self._expires_at = 0.0
+        # Final name -> temporary name of every stream this download wrote to; the only files
+        # cleanup_temp() may remove.
+        self._written = {}
+        self._responses = weakref.WeakSet()
+        self._responses_lock = threading.Lock()
+        self._fragments = None
+        self._ydl_params = None
+        self.stats = {}
+        # Live timings of the current download; stats gets a final copy when it ends.
+        self.metrics = JobMetrics()
+        self.resume_state = {}
+        # extractor / id / title / height / filepath of the last finished download, for the archive and history.
+        self.downloaded = {}
+        self._received = {}
+        self._received_lock = threading.Lock()
 
     def analyze(self, url: str):
+        cached = self._cached_analysis(url)
+        if cached:
+            return cached
         ydl_opts = {
             "noplaylist": True,
             "skip_download": True,
             "quiet": True,
             "no_warnings": True,
         }
+        yt_dlp = load_yt_dlp()
+        if self._cancel_requested:
+            raise RuntimeError("Anulowano")
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with self._session(ydl_opts) as ydl, self._cancellable_requests(ydl):
                 info = ydl.extract_info(url, download=False)
-        except yt_dlp.utils.DownloadError as exc:
-            raise RuntimeError(self._normalize_error(str(exc))) from exc
+                # Same cleanup as --load-info-json, so download() can re-run format selection on it.
+                info = ydl.sanitize_info(info, remove_private_keys=True)
+        except Exception as exc:
+            if self._cancel_requested:
+                raise RuntimeError("Anulowano") from exc
+            if isinstance(exc, yt_dlp.utils.DownloadError):
+                raise RuntimeError(self._normalize_error(str(exc))) from exc
+            raise
 
-        formats = info.get("formats") or []
-        # MP4 video streams (can be merged with M4A audio via FFmpeg).
-        heights = sorted(
-            {
-                f.get("height")
-                for f in formats
-                if f.get("vcodec") not in (None, "none") and f.get("ext") == "mp4"
-            },
-            reverse=True,
-        )
-        available = [f"{h}p" for h in heights if isinstance(h, int)]
-        return {
+        index = FormatIndex.from_info(info)
+        result = {
+            "url": url,
             "title": info.get("title") or "",
-            "available_qualities": available,
+            # Heights of streams that can end up in an MP4 file.
+            "available_qualities": index.qualities(),
+            "formats": index,
+            "info": AnalyzedInfo(info=info, expires_at=self._info_expiry(info)),
         }
+        if self.cache:
+            self.cache.put(url, result, info, result["info"].expires_at)
+        return result
+
+    def iter_entries(self, url: str, _depth: int = 0):
+        # Flat, lazy enumeration: yt-dlp fetches playlist pages only as the generator is consumed,
+        # and entries are not resolved until their own download starts.
+        ydl_opts = {
+            "extract_flat": "in_playlist",
+            "lazy_playlist": True,
+            "skip_download": True,
+            "quiet": True,
+            "no_warnings": True,
+        }
+        yt_dlp = load_yt_dlp()
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+                if info.get("_type") in ("url", "url_transparent"):
+                    # Channel root pages redirect to one of their tabs.
+                    if _depth < MAX_PLAYLIST_DEPTH:
+                        yield from self.iter_entries(info["url"], _depth + 1)
+                    return
+                if info.get("_type") not in ("playlist", "multi_video"):
+                    yield {
+                        "url": info.get("webpage_url") or url,
+                        "title": info.get("title") or "",
+                        "id": info.get("id") or "",
+                        "extractor": info.get("extractor_key") or "",
+                    }
+                    return
+                self._log(f"Playlista: {info.get('title') or url}")
+                for entry in info.get("entries") or []:
+                    if self._cancel_requested:
+                        return
+                    if not entry:
+                        continue
+                    entry_url = entry.get("url") or entry.get("webpage_url")
+                    if not entry_url:
+                        continue
+                    if entry.get("_type") == "playlist" or (entry.get("ie_key") or "").endswith(("Tab", "Playlist")):
+                        if _depth < MAX_PLAYLIST_DEPTH:
+                            yield from self.iter_entries(entry_url, _depth + 1)
+                        continue
+                    yield {
+                        "url": entry_url,
+                        "title": entry.get("title") or "",
+                        "id": entry.get("id") or "",
+                        "extractor": entry.get("ie_key") or "",
+                    }
+        except yt_dlp.utils.DownloadError as exc:
+            raise RuntimeError(self._normalize_error(str(exc))) from exc
+
+    def _session(self, ydl_opts):
+        if self.sessions:
+            return self.sessions.session(ydl_opts)
+        return load_yt_dlp().YoutubeDL(ydl_opts)
+
+    def _cached_analysis(self, url: str):
+        if not self.cache:
+            return None
+        cached = self.cache.get(url)
+        if not cached:
+            return None
+        info = cached.pop("info", None)
+        expires_at = cached.pop("expires_at", 0)
+        cached["info"] = AnalyzedInfo(info=info, expires_at=expires_at) if info else None
+        cached["formats"] = FormatIndex.from_info(info) if info else None
+        return cached
+
+    def _info_expiry(self, info) -> float:
+        expiries = []
+        for f in info.get("formats") or []:
+            match = EXPIRE_RE.search(f.get("url") or "")
+            if match:
+                expiries.append(int(match.group(1)))
+        if expiries:
+            return min(expiries) - EXPIRY_MARGIN
+        return time.time() + INFO_TTL
 
     def download(self, options: DownloadOptions):
-        self._cancel_requested = False
-        self._last_filename = ""
-        self._last_tmpfilename = ""
+        # A Downloader serves one download, so a cancel() that came before it started still counts.
+        if self._cancel_requested:
+            raise RuntimeError("Anulowano")
+        self.urls_expired = False
+        self._written = {}
         os.makedirs(options.output_dir, exist_ok=True)
-        output_template = os.path.join(options.output_dir, "%(title)s.%(ext)s")
+        work_dir = self.staging_dir or options.output_dir
+        os.makedirs(work_dir, exist_ok=True)
+        # The ID in the name keeps same-titled videos apart and lets the archive be rebuilt from disk.
+        output_template = os.path.join(work_dir, "%(title)s [%(id)s].%(ext)s")
 
+        self._fragments = FragmentController(site=urlparse(options.url).hostname or "")
+        self.stats = {}
+        self.metrics = JobMetrics()
+        self.pending_merge = None
+        self._part_format_ids = ""
+        self.resume_state = {"files": []}
+        self.downloaded = {}
+        self._received = {}
         ydl_opts = {
             "outtmpl": output_template,
             "noplaylist": True,
             "progress_hooks": [self._progress_hook],
+            "postprocessor_hooks": [self.metrics.on_postprocessor],
             "merge_output_format": "mp4",
             "format": self._build_format(options),
+            "logger": _YtDlpLogger(self),
+            "concurrent_fragment_downloads": self._fragments.level,
+            "http_chunk_size": HTTP_CHUNK_SIZE,
+            "socket_timeout": SOCKET_TIMEOUT,
+            # Only the failing fragment or stream is retried; progress made so far is kept.
+            "retries": STREAM_RETRIES,
+            "fragment_retries": FRAGMENT_RETRIES,
+            "retry_sleep_functions": {"http": self._retry_sleep, "fragment": self._retry_sleep},
         }
-        if self._needs_ffmpeg(ydl_opts["format"]):
-            if not os.path.exists(FFMPEG_PATH):
-                raise RuntimeError(
-                    "Brak lokalnego FFmpeg. Umiesc plik bin/ffmpeg.exe obok aplikacji."
-                )
-            ydl_opts["ffmpeg_location"] = FFMPEG_PATH
+        if self.defer_merge:
+            # Remuxes run in the post-processing pool too (see _defer_remux).
+            ydl_opts["fixup"] = "never"
+        # Whether FFmpeg is required is only known once the exact formats are chosen.
+        ffmpeg = ffmpeg_location()
+        if ffmpeg:
+            ydl_opts["ffmpeg_location"] = ffmpeg
+
+        if options.info is None:
+            cached = self._cached_analysis(options.url)
+            if cached:
+                options.info = cached["info"]
 
         self._log(f"Start pobierania: {options.url}")
         self._log(f"Format: {options.fmt.upper()}, jakosc: {options.quality}")
 
+        yt_dlp = load_yt_dlp()
+        info = None
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([options.url])
-        except yt_dlp.utils.DownloadError as exc:
-            raise RuntimeError(self._normalize_error(str(exc))) from exc
+            with self._session(ydl_opts) as ydl, self._cancellable_requests(ydl):
+                # The controller retunes this between streams; yt-dlp reads it when each stream starts.
+                self._ydl_params = ydl.params
+                fmt = ydl_opts["format"]
+                if options.info and options.info.is_fresh():
+                    self._log("Uzycie wynikow analizy (bez ponownego pobierania metadanych).")
+                    self.metrics.info_reused = True
+                    info = copy.deepcopy(options.info.info)
+                else:
+                    if options.info:
+                        self._log("Linki do strumieni wygasly, ponowne pobieranie metadanych...")
+                    # Same as extract_info(download=True), split so extraction is timed on its own.
+                    with self.metrics.phase("extract"):
+                        info = ydl.extract_info(options.url, download=False, process=False)
+                self._expires_at = self._info_expiry(info)
+                index = FormatIndex.from_info(info)
+                selection = None if options.format_ids else self._select_formats(index, options.quality)
+                if selection:
+                    fmt = selection.format_ids
+                    self._log(f"Wybrane formaty: {selection.describe()}")
+                elif not ffmpeg and "/" in fmt:
+                    # A fallback expression can still end in a single file; keep only those alternatives.
+                    fmt = "/".join(part for part in fmt.split("/") if not self._needs_ffmpeg(part)) or fmt
+                if self._needs_ffmpeg(fmt) and not ffmpeg:
+                    raise RuntimeError("Brak lokalnego FFmpeg. Umiesc plik bin/ffmpeg.exe obok aplikacji.")
+                if fmt != ydl_opts["format"]:
+                    ydl.format_selector = ydl.build_format_selector(fmt)
+                expected = selection.size if selection else index.expected_size(fmt)
+                self.stats["expected_bytes"] = expected
+                check_free_space(expected, options.output_dir, self.staging_dir, merge=self._needs_ffmpeg(fmt))
+                ydl.format_selector = self.metrics.timed_selector(ydl.format_selector)
+                self.metrics.download_started()
+                if self.defer_merge and self._needs_ffmpeg(fmt):
+                    info = self._download_parts(ydl, info)
+                else:
+                    info = ydl.process_ie_result(info, download=True)
+                if self.staging_dir and self.pending_merge:
+                    # The merge still runs in the staging directory; the pool moves the result.
+                    self.pending_merge["destination"] = options.output_dir
+                    info["filepath"] = os.path.join(options.output_dir, os.path.basename(info["filepath"]))
+                elif self.staging_dir and self._output_path(info):
+                    try:
+                        info["filepath"] = move_file(self._output_path(info), options.output_dir)
+                    except OSError as exc:
+                        raise RuntimeError(f"Nie udalo sie przeniesc pliku do folderu zapisu: {exc}") from exc
+        except Exception as exc:
+            # Cut-off reads surface as extractor or network errors; they are all the cancel.
+            if self._cancel_requested:
+                raise RuntimeError("Anulowano") from exc
+            if isinstance(exc, yt_dlp.utils.DownloadError):
+                raise RuntimeError(self._normalize_error(str(exc))) from exc
+            raise
+        finally:
+            self._ydl_params = None
+            filepath = self._output_path(info) if info else ""
+            self.metrics.finish(filepath)
+            self.stats.update(self._fragments.stats())
+            self.stats.update(self.metrics.snapshot())
+        if info:
+            self.downloaded = {
+                "extractor": info.get("extractor_key") or info.get("extractor") or "",
+                "id": info.get("id") or "",
+                "title": info.get("title") or "",
+                "height": info.get("height"),
+                "filepath": filepath,
+            }
+
+    @contextmanager
+    def _cancellable_requests(self, ydl):
+        # Extraction, manifests and media all go through ydl.urlopen: no request starts after
+        # cancel(), and open responses are registered so cancel() can cut them off. Until the
+        # headers arrive there is no response to cut off, so that wait runs on a helper thread and
+        # cancel() leaves it behind; a response that arrives later is closed right away.
+        original = ydl.urlopen
+
+        def urlopen(request):
+            self._check_cancelled()
+            outcome = {}
+            received = threading.Event()
+
+            def send():
+                try:
+                    response = outcome["response"] = original(request)
+                    with self._responses_lock:
+                        self._responses.add(response)
+                    if self._cancel_requested:
+                        _abort_response(response)
+                except BaseException as exc:
+                    outcome["error"] = exc
+                received.set()
+
+            threading.Thread(target=send, daemon=True).start()
+            while not received.wait(REQUEST_CANCEL_POLL_S):
+                self._check_cancelled()
+            if "error" in outcome:
+                raise outcome["error"]
+            self._check_cancelled()
+            return outcome["response"]
+
+        ydl.urlopen = urlopen
+        try:
+            yield
+        finally:
+            # The session goes back to the pool; its next user must not be cut off by a late cancel().
+            del ydl.urlopen
+            with self._responses_lock:
+                self._responses = weakref.WeakSet()
+
+    def _retry_sleep(self, n: int) -> float:
+        # yt-dlp asks how long to sleep before retry n of a stream or fragment. The wait happens
+        # here instead, so cancel() cuts it short, and expired URLs end the retries early.
+        if self.urls_expired:
+            raise load_yt_dlp().utils.DownloadError("HTTP Error 403: linki do strumieni wygasly")
+        delay = backoff_delay(n, STREAM_RETRY_BASE, STREAM_RETRY_CAP)
+        self.metrics.on_retry_wait(delay)
+        self._cancel_event.wait(delay)
+        self._check_cancelled()
+        return 0
+
+    def _check_cancelled(self):
+        if self._cancel_requested:
+            raise load_yt_dlp().utils.DownloadError("Cancelled by user")
+
+    def _output_path(self, info) -> str:
+        # Single-format downloads without post-processing only report the path per requested download.
+        downloads = info.get("requested_downloads") or [{}]
+        return info.get("filepath") or downloads[-1].get("filepath") or self.resume_state.get("output_path") or ""
+
+    def _download_parts(self, ydl, info):
+        # Mirrors yt-dlp's own merge path (one "<name>.f<format_id>.<ext>" file per requested
+        # format via ydl.dl()), but hands the merge back to the caller instead of running it here.
+        raw = copy.deepcopy(info)
+        resolved = ydl.process_ie_result(info, download=False)
+        requested = resolved.get("requested_formats")
+        if not requested:
+            info = ydl.process_ie_result(raw, download=True)
+            self._defer_remux(info)
+            return info
+        output = ydl.prepare_filename(resolved)
+        root = os.path.splitext(output)[0]
+        # Each part's info only names its own format; the journal needs the combined selection.
+        self._part_format_ids = "+".join(fmt["format_id"] for fmt in requested)
+        parts = []
+        streams = [_merge_stream(fmt) for fmt in requested]
+        for fmt in requested:
+            part_info = dict(resolved)
+            del part_info["requested_formats"]
+            part_info.update(fmt)
+            part = f"{root}.f{fmt['format_id']}.{fmt['ext']}"
+            success, _real_download = ydl.dl(part, part_info)
+            if not success:
+                raise load_yt_dlp().utils.DownloadError(f"Nie udalo sie pobrac formatu {fmt['format_id']}")
+            parts.append(part)
+        self.pending_merge = {
+            "inputs": parts,
+            "output": output,
+            "streams": streams,
+            "extra_args": _metadata_args(resolved),
+        }
+        resolved["filepath"] = output
+        return resolved
+
+    def _defer_remux(self, info):
+        # With fixups off, a single-file HLS (MPEG-TS in .mp4) or DASH m4a download is remuxed by
+        # the post-processing pool instead of on this worker. Without FFmpeg the file stays as is.
+        download = (info.get("requested_downloads") or [info])[0]
+        path = download.get("filepath") or info.get("filepath")
+        protocol = download.get("protocol") or ""
+        if not path or not ffmpeg_location():
+            return
+        if not (protocol.startswith("m3u8") or download.get("container") == "m4a_dash"):
+            return
+        self.pending_merge = {
+            "inputs": [path],
+            "output": path,
+            "streams": [_merge_stream(download)],
+            "extra_args": _metadata_args(info),
+        }
+
+    def _select_formats(self, index: FormatIndex, quality: str):
+        # Playlist entries and jobs without an analysis are resolved here, once the formats are known.
+        with self.metrics.phase("format_select"):
+            return index.select(quality, self.format_policy)
 
     def _build_format(self, options: DownloadOptions):
+        if options.format_ids:
+            return options.format_ids
+        # Fallback expression for results without a format list (yt-dlp resolves those itself).
         quality = options.quality
         if quality == "auto":
             return "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]"
@@ -99,14 +580,17 @@ class Downloader:
 
     def _progress_hook(self, data):
         filename = data.get("filename")
-        tmpfilename = data.get("tmpfilename")
-        if filename:
-            self._last_filename = filename
-        if tmpfilename:
-            self._last_tmpfilename = tmpfilename
-        if self._cancel_requested:
-            raise yt_dlp.utils.DownloadError("Cancelled by user")
+        if filename and data.get("status") == "downloading":
+            # "finished" alone means the file was already on disk, so it is not ours to delete.
+            self._written[filename] = data.get("tmpfilename") or filename + ".part"
+        self._update_resume_state(data)
+        self.metrics.on_progress(data)
+        self._check_cancelled()
+        if self.throttle and data.get("status") == "downloading":
+            self._throttle(data)
         if data.get("status") == "downloading":
+            if self._fragments:
+                self._fragments.stream_progress(data)
             total = data.get("total_bytes") or data.get("total_bytes_estimate")
             if total:
                 percent = data.get("downloaded_bytes", 0) * 100 / total
@@ -118,12 +602,62 @@ class Downloader:
                 if self.status_cb:
                     self.status_cb(status)
         elif data.get("status") == "finished":
+            level = self._fragments.stream_finished(data) if self._fragments else None
+            if level and self._ydl_params is not None:
+                self._ydl_params["concurrent_fragment_downloads"] = level
             if self.progress_cb:
                 self.progress_cb(100.0)
             self._log("Pobieranie zakonczone, trwa przetwarzanie...")
             if self.status_cb:
                 self.status_cb("Pobieranie zakonczone, trwa przetwarzanie...")
 
+    def _throttle(self, data):
+        # Sleeping in the hook stalls the reading thread, which is what caps the transfer rate.
+        key = data.get("tmpfilename") or data.get("filename") or ""
+        downloaded = data.get("downloaded_bytes") or 0
+        with self._received_lock:
+            delta = downloaded - self._received.get(key, downloaded)
+            self._received[key] = max(downloaded, self._received.get(key, 0))
+        if delta > 0:
+            self.throttle(delta)
+
+    def _update_resume_state(self, data):
+        state = self.resume_state
+        changed = False
+        for path in (data.get("filename"), data.get("tmpfilename")):
+            if path and path not in state.setdefault("files", []):
+                state["files"].append(path)
+                changed = True
+        info = data.get("info_dict") or {}
+        requested = info.get("requested_formats")
+        format_ids = "+".join(f["format_id"] for f in requested) if requested else info.get("format_id") or ""
+        format_ids = self._part_format_ids or format_ids
+        if format_ids and format_ids != state.get("format_ids"):
+            state["format_ids"] = format_ids
+            changed = True
+        if info.get("_filename") or info.get("filepath"):
+            state["output_path"] = info.get("filepath") or info.get("_filename")
+        for key in ("fragment_index", "fragment_count", "downloaded_bytes"):
+            if data.get(key) is not None:
+                state[key] = data[key]
+        if self.state_cb and (changed or data.get("fragment_index") is not None or data.get("status") == "finished"):
+            self.state_cb(state)
+
+    def current_stats(self) -> dict:
+        # Safe to call from another thread while download() runs.
+        stats = dict(self.stats)
+        stats.update(self.metrics.snapshot())
+        if self._fragments:
+            stats.update(self._fragments.stats())
+        return stats
+
+    def _on_ytdlp_message(self, message):
+        self.metrics.on_message(message)
+        if "HTTP Error 403" in message and self._expires_at and time.time() >= self._expires_at:
+            self.urls_expired = True
+        if self._fragments and self._ydl_params is not None and THROTTLE_RE.search(message):
+            self._ydl_params["concurrent_fragment_downloads"] = self._fragments.on_throttled()
+
     def _log(self, message):
         if self.log_cb:
             self.log_cb(message)
@@ -140,25 +674,42 @@ class Downloader:
         return message
 
     def _needs_ffmpeg(self, fmt: str) -> bool:
-        return "bestvideo" in fmt
+        return "+" in fmt
 
     def cancel(self):
+        # Any thread. The download stops at its next progress hook or request; reads blocked on a
+        # slow or silent server are woken by shutting their sockets down.
         self._cancel_requested = True
+        self._cancel_event.set()
+        with self._responses_lock:
+            responses = list(self._responses)
+        for response in responses:
+            _abort_response(response)
 
-    def cleanup_temp(self):
-        candidates = []
-        if self._last_filename:
-            candidates.append(self._last_filename)
-            candidates.append(self._last_filename + ".part")
-        if self._last_tmpfilename:
-            candidates.append(self._last_tmpfilename)
-            candidates.append(self._last_tmpfilename + ".part")
-        for path in candidates:
-            try:
-                if os.path.exists(path):
+    def cleanup_temp(self, budget: float = CLEANUP_BUDGET_S) -> int:
+        # Removes only files this download wrote: the streams, their .part and .ytdl files and
+        # fragment files ("<name>.part-Frag12"). Gives up after budget seconds.
+        deadline = time.monotonic() + budget
+        removed = 0
+        listings = {}
+        for filename, tmpfilename in list(self._written.items()):
+            folder = os.path.dirname(tmpfilename) or "."
+            if folder not in listings:
+                try:
+                    listings[folder] = os.listdir(folder)
+                except OSError:
+                    listings[folder] = []
+            prefix = os.path.basename(tmpfilename) + "-Frag"
+            fragments = [os.path.join(folder, name) for name in listings[folder] if name.startswith(prefix)]
+            for path in [filename, tmpfilename, filename + ".ytdl", *fragments]:
+                if time.monotonic() > deadline:
+                    return removed
+                try:
                     os.remove(path)
-            except Exception:
-                pass
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
 
     def _format_progress_status(self, data) -> str:
         percent_value = data.get("downloaded_bytes")
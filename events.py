@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+# Only the newest value of these matters; older ones are merged away per (kind, key).
+COALESCED_KINDS = ("progress", "status", "job")
+DEFAULT_MAX_RATE = 10
+MAX_PENDING_LOGS = 2000
+
+
+@dataclass
+class EventBatch:
+    logs: list = field(default_factory=list)
+    updates: list = field(default_factory=list)
+    events: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.logs or self.updates or self.events)
+
+
+class EventBus:
+    def __init__(self, max_rate=DEFAULT_MAX_RATE, max_pending_logs=MAX_PENDING_LOGS):
+        self.max_rate = max_rate
+        self.max_pending_logs = max_pending_logs
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._logs = deque()
+        self._events = []
+        self._last_drain = 0.0
+        self._posted = 0
+        self._merged = 0
+        self._dropped = 0
+        self._delivered = 0
+        self._batches = 0
+
+    @property
+    def interval_ms(self) -> int:
+        return max(1, int(1000 / self.max_rate))
+
+    def post(self, kind, value, key=None):
+        with self._lock:
+            self._posted += 1
+            if kind == "log":
+                if len(self._logs) >= self.max_pending_logs:
+                    # Keep the newest lines; the UI can't show a burst this large in one tick anyway.
+                    self._logs.popleft()
+                    self._dropped += 1
+                self._logs.append(value)
+            elif kind in COALESCED_KINDS:
+                slot = (kind, key)
+                if slot in self._latest:
+                    self._merged += 1
+                    del self._latest[slot]
+                self._latest[slot] = value
+            else:
+                self._events.append((kind, value))
+
+    def drain(self) -> EventBatch:
+        now = time.monotonic()
+        with self._lock:
+            # Small tolerance so a timer firing a little early does not skip a whole tick.
+            if now - self._last_drain < 0.9 / self.max_rate:
+                return EventBatch()
+            self._last_drain = now
+            batch = EventBatch(
+                logs=list(self._logs),
+                updates=[(kind, value) for (kind, _key), value in self._latest.items()],
+                events=self._events,
+            )
+            self._logs.clear()
+            self._latest = {}
+            self._events = []
+            self._delivered += len(batch.logs) + len(batch.updates) + len(batch.events)
+            if batch:
+                self._batches += 1
+        return batch
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "posted": self._posted,
+                "delivered": self._delivered,
+                "merged": self._merged,
+                "dropped": self._dropped,
+                "batches": self._batches,
+            }
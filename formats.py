@@ -0,0 +1,247 @@
+from dataclasses import dataclass
+
+# vcodec/acodec prefixes -> codec family. Anything else is kept, but only used when nothing
+# known is available at the chosen height.
+CODEC_FAMILIES = (
+    ("avc", "h264"),
+    ("h264", "h264"),
+    ("av01", "av1"),
+    ("av1", "av1"),
+    ("vp09", "vp9"),
+    ("vp9", "vp9"),
+    ("hev", "hevc"),
+    ("hvc", "hevc"),
+    ("mp4a", "aac"),
+    ("aac", "aac"),
+    ("opus", "opus"),
+)
+# H.264 plays everywhere; the others only replace it when they save enough bytes.
+BASELINE_CODEC = "h264"
+EFFICIENT_CODECS = ("av1", "vp9")
+# All of these are stream-copied into the MP4 container by FFmpeg.
+MP4_VIDEO_CODECS = (BASELINE_CODEC,) + EFFICIENT_CODECS
+MP4_AUDIO_CODECS = ("aac", "opus")
+DEFAULT_MIN_SAVINGS = 0.2
+# Candidates within this fraction of the smallest size count as equally small; the ranking hints
+# (plain HTTPS over HLS, no merge) decide between them.
+SIZE_TOLERANCE = 0.02
+CODEC_NAMES = {"h264": "H.264", "av1": "AV1", "vp9": "VP9", "hevc": "HEVC"}
+
+
+def codec_family(codec) -> str:
+    codec = (codec or "").lower()
+    if codec in ("", "none"):
+        return ""
+    for prefix, family in CODEC_FAMILIES:
+        if codec.startswith(prefix):
+            return family
+    return codec.split(".", 1)[0]
+
+
+def format_size(size) -> str:
+    if not size:
+        return "?"
+    if size >= 1_000_000_000:
+        return f"{size / 1_000_000_000:.2f} GB"
+    return f"{size / 1_000_000:.1f} MB"
+
+
+@dataclass
+class FormatPolicy:
+    # Switch from H.264 to AV1/VP9 only when the whole download gets at least min_savings smaller.
+    prefer_efficient: bool = True
+    min_savings: float = DEFAULT_MIN_SAVINGS
+    # The chosen quality is a ceiling; with quality_floor it is a minimum instead (nearest height at
+    # or above it), which downloads more when a video skips the requested height.
+    quality_floor: bool = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            prefer_efficient=settings.prefer_efficient_codecs,
+            min_savings=settings.codec_min_savings_pct / 100,
+            quality_floor=settings.quality_floor,
+        )
+
+
+@dataclass
+class Stream:
+    format_id: str
+    ext: str
+    height: int
+    fps: float
+    vcodec: str
+    acodec: str
+    tbr: float
+    # Bytes; exact when the site reports filesize, otherwise approximated (approx=True).
+    size: int
+    approx: bool
+    hdr: bool
+    # Ranking hints: plain HTTPS over HLS, original audio track over dubs / DRC variants.
+    preference: tuple
+
+    @property
+    def has_video(self) -> bool:
+        return bool(self.vcodec)
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self.acodec)
+
+
+@dataclass
+class Selection:
+    format_ids: str
+    video: Stream
+    audio: Stream
+    size: int
+    approx: bool
+
+    def describe(self) -> str:
+        parts = []
+        if self.video.height:
+            fps = f"{self.video.fps:g}" if self.video.fps and self.video.fps > 30 else ""
+            parts.append(f"{self.video.height}p{fps}")
+        if self.video.vcodec != "?":
+            parts.append(CODEC_NAMES.get(self.video.vcodec, self.video.vcodec))
+        parts.append(f"format {self.format_ids}")
+        size = format_size(self.size) if self.size else "nieznany"
+        if self.size and self.approx:
+            size = "~" + size
+        return f"{size} ({', '.join(parts)})"
+
+
+class FormatIndex:
+    # Per-stream facts from info["formats"], built once per analysis so a quality can be resolved
+    # to exact format IDs without asking yt-dlp to re-evaluate a format expression.
+    def __init__(self, streams):
+        self.streams = streams
+
+    @classmethod
+    def from_info(cls, info: dict):
+        duration = info.get("duration") or 0
+        streams = []
+        for f in info.get("formats") or []:
+            if not f.get("format_id") or f.get("has_drm"):
+                continue
+            vcodec = codec_family(f.get("vcodec"))
+            acodec = codec_family(f.get("acodec"))
+            # Sites that do not report codecs: a video-less audio-only entry states its ext.
+            if f.get("vcodec") is None and f.get("acodec") is None:
+                vcodec, acodec = ("", "aac") if f.get("ext") in ("m4a", "mp3", "aac") else ("?", "?")
+            if not vcodec and not acodec:
+                # Storyboards and other images.
+                continue
+            tbr = f.get("tbr") or 0
+            size = f.get("filesize")
+            approx = not size
+            if not size:
+                size = f.get("filesize_approx") or (int(tbr * 1000 / 8 * duration) if tbr and duration else 0)
+            protocol = f.get("protocol") or ""
+            note = (f.get("format_note") or "").lower()
+            preference = (
+                0 if protocol.startswith("http") and "dash" not in protocol else 1,
+                0 if "drc" not in note and "drc" not in f["format_id"] else 1,
+                -(f.get("language_preference") or 0),
+            )
+            streams.append(
+                Stream(
+                    format_id=str(f["format_id"]),
+                    ext=f.get("ext") or "",
+                    height=f.get("height") or 0,
+                    fps=f.get("fps") or 0,
+                    vcodec=vcodec,
+                    acodec=acodec,
+                    tbr=tbr,
+                    size=int(size or 0),
+                    approx=approx,
+                    hdr=(f.get("dynamic_range") or "SDR") != "SDR",
+                    preference=preference,
+                )
+            )
+        return cls(streams)
+
+    def _videos(self):
+        # Video-only streams of any MP4-compatible codec, plus muxed streams already in MP4.
+        return [
+            s
+            for s in self.streams
+            if s.has_video and (s.ext == "mp4" or (not s.has_audio and s.vcodec in MP4_VIDEO_CODECS))
+        ]
+
+    def qualities(self):
+        heights = sorted({s.height for s in self._videos() if s.height}, reverse=True)
+        return [f"{h}p" for h in heights]
+
+    def expected_size(self, format_ids: str) -> int:
+        # Size of an exact "137+140" selection; 0 when any part is unknown (or it is an expression).
+        streams = {s.format_id: s for s in self.streams}
+        sizes = [streams[fid].size if fid in streams else 0 for fid in format_ids.split("+")]
+        return sum(sizes) if sizes and all(sizes) else 0
+
+    def best_audio(self):
+        audios = [s for s in self.streams if s.has_audio and not s.has_video and s.acodec in MP4_AUDIO_CODECS]
+        if not audios:
+            return None
+        # AAC first (MP4's native audio), then the ranking hints, then the highest bitrate.
+        return min(audios, key=lambda s: (s.acodec != "aac", s.preference, -s.tbr, -s.size))
+
+    def select(self, quality: str, policy: FormatPolicy = None):
+        policy = policy or FormatPolicy()
+        videos = self._videos()
+        if not videos:
+            return None
+        heights = sorted({s.height for s in videos})
+        if quality and quality != "auto":
+            try:
+                target = int(quality.rstrip("p"))
+            except ValueError:
+                return None
+            below = [h for h in heights if h <= target]
+            above = [h for h in heights if h >= target]
+            if policy.quality_floor:
+                height = above[0] if above else heights[-1]
+            else:
+                # The tallest height up to the request; higher only if the video has nothing that small.
+                height = below[-1] if below else heights[0]
+        else:
+            height = heights[-1]
+        at_height = [s for s in videos if s.height == height]
+        # Higher frame rates are a different quality, not a codec choice.
+        fps = max(s.fps for s in at_height)
+        at_height = [s for s in at_height if s.fps == fps]
+        # HDR streams only when there is no SDR version; they look washed out on most players.
+        at_height = [s for s in at_height if not s.hdr] or at_height
+
+        audio = self.best_audio()
+        candidates = []
+        for video in at_height:
+            if video.has_audio:
+                candidates.append(Selection(video.format_id, video, None, video.size, video.approx))
+            elif audio:
+                size = video.size + audio.size if video.size and audio.size else 0
+                candidates.append(
+                    Selection(f"{video.format_id}+{audio.format_id}", video, audio, size, video.approx or audio.approx)
+                )
+        if not candidates:
+            return None
+
+        def smallest(options):
+            # Unknown sizes only when no size is known; muxed streams win ties since they need no merge.
+            sized = [c for c in options if c.size]
+            if sized:
+                limit = min(c.size for c in sized) * (1 + SIZE_TOLERANCE)
+                options = [c for c in sized if c.size <= limit]
+            return min(options, key=lambda c: (c.video.preference, c.audio is not None, c.size))
+
+        baseline = [c for c in candidates if c.video.vcodec == BASELINE_CODEC]
+        efficient = [c for c in candidates if c.video.vcodec in EFFICIENT_CODECS]
+        if not baseline:
+            # Nothing in H.264 at this height (typical above 1080p): take the smallest MP4-compatible stream.
+            return smallest(efficient or candidates)
+        choice = smallest(baseline)
+        if policy.prefer_efficient and efficient and choice.size:
+            alternative = smallest(efficient)
+            if alternative.size and alternative.size <= choice.size * (1 - policy.min_savings):
+                return alternative
+        return choice
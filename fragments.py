@@ -0,0 +1,120 @@
+import threading
+
+MIN_LEVEL = 1
+MAX_LEVEL = 16
+START_LEVEL = 2
+# A higher level is kept only if it beats the best level so far by this factor.
+STEP_UP_GAIN = 1.10
+HTTP_CHUNK_SIZE = 10 * 1024 * 1024
+
+_learned = {}
+_learned_lock = threading.Lock()
+
+
+class FragmentController:
+    # Hill-climbs `concurrent_fragment_downloads` per job. yt-dlp fixes the level when a stream
+    # starts, so a new level is picked after every finished fragmented stream. Throughput is only
+    # compared within one kind of stream (video with video, audio with audio), and the best level
+    # and measurements are remembered per site for the next job.
+    def __init__(self, site: str = ""):
+        self.site = site
+        with _learned_lock:
+            learned = _learned.get(site) or {}
+        self.level = learned.get("level", START_LEVEL)
+        self.ceiling = MAX_LEVEL
+        self.best_level = None
+        # stream kind -> (level, throughput) of its best measurement so far.
+        self.best = dict(learned.get("best") or {})
+        self.settled = False
+        self.throttled = 0
+        self.history = []
+        self._bytes = 0
+        self._seconds = 0.0
+        # filename -> first progress seen (downloaded_bytes, elapsed, fragmented); bytes a resumed
+        # download already had on disk are counted in downloaded_bytes and must not count as speed.
+        self._started = {}
+
+    @property
+    def throughput(self) -> float:
+        return self._bytes / self._seconds if self._seconds else 0.0
+
+    def stream_progress(self, data):
+        filename = data.get("filename")
+        if not filename:
+            return
+        start = self._started.get(filename)
+        if start is None:
+            self._started[filename] = (data.get("downloaded_bytes") or 0, data.get("elapsed") or 0.0,
+                                       bool(data.get("fragment_count")))
+        elif not start[2] and data.get("fragment_count"):
+            self._started[filename] = (start[0], start[1], True)
+
+    def stream_finished(self, data) -> int:
+        # "finished" carries neither fragment_count nor the resume offset; both come from the
+        # stream's progress events. A file finished without any (already on disk) is not measured.
+        start = self._started.pop(data.get("filename"), None)
+        if start is None:
+            return self.level
+        info = data.get("info_dict") or {}
+        downloaded = (data.get("downloaded_bytes") or data.get("total_bytes") or 0) - start[0]
+        elapsed = (data.get("elapsed") or 0) - start[1]
+        if downloaded <= 0 or elapsed <= 0:
+            return self.level
+        self._bytes += downloaded
+        self._seconds += elapsed
+        throughput = downloaded / elapsed
+        fragmented = start[2] or bool(info.get("fragments"))
+        stream = _stream_kind(info)
+        self.history.append({"level": self.level, "stream": stream, "throughput": throughput,
+                             "fragmented": fragmented})
+        if fragmented:
+            self._adapt(stream, throughput)
+        return self.level
+
+    def _adapt(self, stream: str, throughput: float):
+        best = self.best.get(stream)
+        if best is None or throughput > best[1] * STEP_UP_GAIN:
+            self.best[stream] = (self.level, throughput)
+            self.best_level = self.level
+            if not self.settled:
+                self.level = min(self.level * 2, self.ceiling)
+        else:
+            # Worse than the best level for this stream kind, or a plateau where more parallelism
+            # doesn't pay off: go back to (or stay on) the cheaper level.
+            self.best_level = min(best[0], self.level)
+            self.level = self.best_level
+            self.settled = True
+        self._remember()
+
+    def on_throttled(self):
+        # 403/429 while fragments run in parallel: back off hard and never climb past this again.
+        self.throttled += 1
+        self.level = max(MIN_LEVEL, self.level // 2)
+        self.ceiling = max(MIN_LEVEL, self.level)
+        if self.best_level is not None:
+            self.best_level = min(self.best_level, self.level)
+        self.settled = True
+        self._remember()
+        return self.level
+
+    def _remember(self):
+        level = self.best_level or self.level
+        with _learned_lock:
+            _learned[self.site] = {"level": max(MIN_LEVEL, min(level, self.ceiling)), "best": dict(self.best)}
+
+    def stats(self) -> dict:
+        return {
+            "fragment_concurrency": self.level,
+            "fragment_best_level": self.best_level,
+            "fragment_throttled": self.throttled,
+            "fragment_history": list(self.history),
+            "throughput": self.throughput,
+        }
+
+
+def _stream_kind(info: dict) -> str:
+    if info.get("vcodec") == "none":
+        return "audio"
+    if info.get("vcodec") or info.get("height"):
+        return "video"
+    return info.get("format_id") or ""
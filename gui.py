@@ -1,15 +1,33 @@
 import os
 import threading
-import queue
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
-from downloader import Downloader, DownloadOptions
-from settings import SettingsStore, DEFAULT_OUTPUT
+import startup
+from archive import DownloadArchive
+from bandwidth import BandwidthManager
+from bulk import BulkAnalyzer
+from cache import MetadataCache
+from downloader import Downloader, DownloadOptions, STANDARD_QUALITIES, is_yt_dlp_loaded, warm_up
+from events import EventBus
+from formats import FormatPolicy, format_size
+from history import DownloadHistory, PAGE_SIZE
+from jobs import JobQueue, STATE_LABELS, FINISHED_STATES, RUNNING, MERGING, QUEUED, PAUSED
+from journal import JobJournal
+from logview import LogView, file_logger
+from metrics import MetricsExporter
+from postprocess import PostProcessor
+from retry import RetryPolicy
+from sessions import SessionPool
+from settings import SettingsStore, DEFAULT_OUTPUT, MAX_WORKERS_LIMIT
+from speculative import DEBOUNCE_MS, SpeculativeAnalyzer, looks_like_url
+
+CLIPBOARD_POLL_MS = 700
 
 
 class App(tk.Tk):
-    def __init__(self):
+    def __init__(self, startup_report=False):
         super().__init__()
         self.title("4K Video Converter")
         self.minsize(760, 520)
@@ -18,17 +36,87 @@ class App(tk.Tk):
         self.settings_store = SettingsStore()
         self.settings = self.settings_store.load()
 
-        self._queue = queue.Queue()
-        self._downloader = Downloader(progress_cb=self._on_progress, log_cb=self._on_log, status_cb=self._on_status)
-        self._download_thread = None
-        self._analyze_thread = None
+        self._events = EventBus()
+        self._cache = MetadataCache()
+        self._sessions = SessionPool()
+        self._jobs = JobQueue(
+            max_workers=self.settings.max_workers,
+            on_update=self._on_job_update,
+            on_log=self._on_job_log,
+            cache=self._cache,
+            sessions=self._sessions,
+            journal=JobJournal(),
+            archive=DownloadArchive(),
+            metrics=MetricsExporter(port=self.settings.metrics_port),
+            postprocess=PostProcessor(),
+            format_policy=FormatPolicy.from_settings(self.settings),
+            history=DownloadHistory(),
+            staging_dir=self.settings.staging_dir,
+            retry=RetryPolicy(),
+            bandwidth=BandwidthManager(
+                limit=self.settings.bandwidth_limit_mbps * 1_000_000,
+                schedule=self.settings.bandwidth_schedule,
+            ),
+        )
+        self._analysis = None
+        self._speculative = SpeculativeAnalyzer(
+            lambda: Downloader(log_cb=self._on_log, cache=self._cache, sessions=self._sessions),
+            on_done=lambda *value: self._events.post("analyze_done", value),
+        )
+        # URL whose analysis the user asked for (Analizuj); its errors are shown in a dialog.
+        self._analysis_requested = None
+        self._url_after = None
+        self._clipboard_seen = None
+        self._clipboard_url = ""
+        self._bulk = BulkAnalyzer()
+        self._bulk_thread = None
+        self._bulk_results = {}
+        self._bulk_enqueued = set()
+        self._history_cursor = None
+        self._history_search_after = None
         self._closing = False
+        self._startup_report = startup_report
 
         self._build_ui()
         self._apply_settings_to_ui()
 
-        self.after(100, self._poll_queue)
+        self._jobs.start()
+        self.after(self._events.interval_ms, self._poll_queue)
+        self.after(1000, self._refresh_allocations)
+        self.after(CLIPBOARD_POLL_MS, self._poll_clipboard)
         self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.bind("<Map>", self._on_first_map, add="+")
+
+    def _on_first_map(self, _event):
+        self.unbind("<Map>")
+        # Runs once the window is mapped and idle tasks (the first paint) are done.
+        self.after_idle(self._on_first_frame)
+
+    def _on_first_frame(self):
+        startup.mark("first frame")
+        warm_up(done_cb=lambda: self._events.post("warm_done", None))
+        if not self._startup_report:
+            self.after(200, self._offer_resume)
+
+    def _offer_resume(self):
+        entries = self._jobs.journal.entries()
+        if not entries:
+            return
+        resume = messagebox.askyesno(
+            "Wznowic?",
+            f"Znaleziono przerwane pobierania: {len(entries)}.\n"
+            "Wznowic je teraz? (Nie = zostana dodane jako wstrzymane; pliki czesciowe nie sa usuwane)",
+        )
+        for job in self._jobs.restore(entries, paused=not resume):
+            self._append_log(f"Przywrocono z dziennika: {job.label}")
+
+    def _on_warm_done(self):
+        startup.mark("yt_dlp ready")
+        if self._startup_report:
+            text = startup.report()
+            print(text)
+            file_logger().info(text)
+            self.destroy()
 
     def _set_icon(self):
         # Optional: if you add an .ico file in assets/app.ico it will be used.
@@ -51,12 +139,20 @@ class App(tk.Tk):
         notebook.grid(row=0, column=0, sticky="nsew", padx=14, pady=12)
 
         self.tab_download = ttk.Frame(notebook)
+        self.tab_bulk = ttk.Frame(notebook)
+        self.tab_history = ttk.Frame(notebook)
         self.tab_settings = ttk.Frame(notebook)
 
         notebook.add(self.tab_download, text="Pobieranie")
+        notebook.add(self.tab_bulk, text="Wiele linkow")
+        notebook.add(self.tab_history, text="Historia")
         notebook.add(self.tab_settings, text="Ustawienia")
+        notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        self._notebook = notebook
 
         self._build_download_tab()
+        self._build_bulk_tab()
+        self._build_history_tab()
         self._build_settings_tab()
 
     def _apply_light_theme(self, style: ttk.Style):
@@ -96,6 +192,7 @@ class App(tk.Tk):
         frame.columnconfigure(0, weight=1)
         frame.columnconfigure(1, weight=0)
         frame.rowconfigure(5, weight=1)
+        frame.rowconfigure(6, weight=1)
 
         header = ttk.Frame(frame)
         header.grid(row=0, column=0, columnspan=2, sticky="ew", padx=6, pady=(4, 12))
@@ -113,10 +210,16 @@ class App(tk.Tk):
         self.url_var = tk.StringVar()
         self.url_entry = ttk.Entry(card, textvariable=self.url_var)
         self.url_entry.grid(row=1, column=0, columnspan=2, sticky="ew", padx=12, pady=(0, 10))
+        self.url_var.trace_add("write", self._on_url_changed)
 
         self.analyze_btn = ttk.Button(card, text="Analizuj", command=self._start_analyze)
         self.analyze_btn.grid(row=2, column=0, sticky="w", padx=12, pady=(0, 12))
 
+        self.batch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            card, text="Cala playlista / kanal", variable=self.batch_var, command=self._on_batch_toggle
+        ).grid(row=2, column=1, sticky="e", padx=12, pady=(0, 12))
+
         row = ttk.Frame(frame, style="CardAlt.TFrame")
         row.grid(row=2, column=0, columnspan=2, sticky="ew", padx=6, pady=(0, 12))
         row.columnconfigure(0, weight=1)
@@ -130,7 +233,13 @@ class App(tk.Tk):
             values=["auto"],
             state="disabled",
         )
-        self.quality_combo.grid(row=1, column=0, sticky="w", padx=12, pady=(0, 12))
+        self.quality_combo.grid(row=1, column=0, sticky="w", padx=12, pady=(0, 4))
+        self.quality_combo.bind("<<ComboboxSelected>>", lambda _event: self._update_expected_size())
+
+        self.expected_size_var = tk.StringVar(value="")
+        ttk.Label(row, textvariable=self.expected_size_var, style="Sub.TLabel").grid(
+            row=2, column=0, columnspan=2, sticky="w", padx=12, pady=(0, 10)
+        )
 
         self.format_var = tk.StringVar(value="mp4")
 
@@ -146,8 +255,53 @@ class App(tk.Tk):
         self.status_label = ttk.Label(frame, textvariable=self.status_var)
         self.status_label.grid(row=4, column=0, columnspan=2, sticky="w", padx=8, pady=(0, 10))
 
+        jobs_card = ttk.Frame(frame, style="Card.TFrame")
+        jobs_card.grid(row=5, column=0, columnspan=2, sticky="nsew", padx=6, pady=(0, 12))
+        jobs_card.columnconfigure(0, weight=1)
+        jobs_card.rowconfigure(1, weight=1)
+
+        ttk.Label(jobs_card, text="Kolejka:").grid(row=0, column=0, sticky="w", padx=12, pady=(10, 4))
+        self.jobs_tree = ttk.Treeview(
+            jobs_card,
+            columns=("title", "quality", "state", "progress", "priority", "limit", "status"),
+            show="headings",
+            height=5,
+            selectmode="browse",
+        )
+        for column, text, width, stretch in (
+            ("title", "Tytul", 260, True),
+            ("quality", "Jakosc", 70, False),
+            ("state", "Stan", 90, False),
+            ("progress", "Postep", 70, False),
+            ("priority", "Priorytet", 70, False),
+            ("limit", "Przydzial", 80, False),
+            ("status", "Status", 220, True),
+        ):
+            self.jobs_tree.heading(column, text=text, anchor="w")
+            self.jobs_tree.column(column, width=width, stretch=stretch, anchor="w")
+        self.jobs_tree.grid(row=1, column=0, sticky="nsew", padx=(12, 0), pady=(0, 6))
+        jobs_scroll = ttk.Scrollbar(jobs_card, orient="vertical", command=self.jobs_tree.yview)
+        jobs_scroll.grid(row=1, column=1, sticky="ns", padx=(0, 12), pady=(0, 6))
+        self.jobs_tree.configure(yscrollcommand=jobs_scroll.set)
+
+        buttons = ttk.Frame(jobs_card, style="Card.TFrame")
+        buttons.grid(row=2, column=0, columnspan=2, sticky="w", padx=12, pady=(0, 12))
+        for column, (text, command) in enumerate(
+            (
+                ("Wstrzymaj", self._pause_job),
+                ("Wznow", self._resume_job),
+                ("Anuluj", self._cancel_job),
+                ("W gore", lambda: self._move_job(-1)),
+                ("W dol", lambda: self._move_job(1)),
+                ("Priorytet +", lambda: self._change_priority(1)),
+                ("Priorytet -", lambda: self._change_priority(-1)),
+                ("Wyczysc zakonczone", self._clear_finished_jobs),
+            )
+        ):
+            ttk.Button(buttons, text=text, command=command).grid(row=0, column=column, padx=(0, 6))
+
         log_card = ttk.Frame(frame, style="Card.TFrame")
-        log_card.grid(row=5, column=0, columnspan=2, sticky="nsew", padx=6, pady=(0, 6))
+        log_card.grid(row=6, column=0, columnspan=2, sticky="nsew", padx=6, pady=(0, 6))
         log_card.columnconfigure(0, weight=1)
         log_card.rowconfigure(1, weight=1)
 
@@ -158,6 +312,194 @@ class App(tk.Tk):
         scroll = ttk.Scrollbar(log_card, orient="vertical", command=self.log_text.yview)
         scroll.grid(row=1, column=1, sticky="ns", padx=(0, 12), pady=(0, 12))
         self.log_text.configure(yscrollcommand=scroll.set)
+        self._log_view = LogView(self.log_text)
+
+    def _build_bulk_tab(self):
+        frame = self.tab_bulk
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(2, weight=1)
+
+        header = ttk.Frame(frame)
+        header.grid(row=0, column=0, sticky="ew", padx=6, pady=(4, 12))
+        header.columnconfigure(0, weight=1)
+        ttk.Label(header, text="Wiele linkow", style="Title.TLabel").grid(row=0, column=0, sticky="w")
+        ttk.Label(
+            header, text="Wklej linki (jeden w linii), przeanalizuj je rownolegle i dodaj do kolejki.", style="Sub.TLabel"
+        ).grid(row=1, column=0, sticky="w")
+
+        card = ttk.Frame(frame, style="Card.TFrame")
+        card.grid(row=1, column=0, sticky="ew", padx=6, pady=(0, 12))
+        card.columnconfigure(0, weight=1)
+
+        ttk.Label(card, text="Linki:").grid(row=0, column=0, sticky="w", padx=12, pady=(10, 4))
+        self.bulk_text = tk.Text(card, height=6, wrap="none")
+        self.bulk_text.grid(row=1, column=0, sticky="ew", padx=12, pady=(0, 10))
+        self.bulk_text.configure(bg="#ffffff", fg="#1f2328", insertbackground="#1f2328")
+
+        controls = ttk.Frame(card, style="Card.TFrame")
+        controls.grid(row=2, column=0, sticky="ew", padx=12, pady=(0, 12))
+        ttk.Label(controls, text="Jakosc:").grid(row=0, column=0, sticky="w", padx=(0, 6))
+        self.bulk_quality_var = tk.StringVar(value="auto")
+        bulk_quality = ttk.Combobox(
+            controls, textvariable=self.bulk_quality_var, values=["auto"] + STANDARD_QUALITIES, state="readonly", width=8
+        )
+        bulk_quality.grid(row=0, column=1, sticky="w", padx=(0, 12))
+        bulk_quality.bind("<<ComboboxSelected>>", lambda _event: self._refresh_bulk_sizes())
+        self.bulk_analyze_btn = ttk.Button(controls, text="Analizuj wszystkie", command=self._start_bulk_analyze)
+        self.bulk_analyze_btn.grid(row=0, column=2, sticky="w", padx=(0, 6))
+        self.bulk_cancel_btn = ttk.Button(controls, text="Przerwij", command=self._cancel_bulk_analyze, state="disabled")
+        self.bulk_cancel_btn.grid(row=0, column=3, sticky="w", padx=(0, 6))
+        ttk.Button(controls, text="Dodaj do kolejki", command=self._enqueue_bulk, style="Primary.TButton").grid(
+            row=0, column=4, sticky="w"
+        )
+
+        results_card = ttk.Frame(frame, style="Card.TFrame")
+        results_card.grid(row=2, column=0, sticky="nsew", padx=6, pady=(0, 12))
+        results_card.columnconfigure(0, weight=1)
+        results_card.rowconfigure(1, weight=1)
+
+        self.bulk_status_var = tk.StringVar(value="")
+        ttk.Label(results_card, textvariable=self.bulk_status_var).grid(row=0, column=0, sticky="w", padx=12, pady=(10, 4))
+        self.bulk_tree = ttk.Treeview(
+            results_card, columns=("title", "qualities", "size", "status"), show="headings", height=8
+        )
+        for column, text, width, stretch in (
+            ("title", "Tytul", 280, True),
+            ("qualities", "Jakosci", 150, False),
+            ("size", "Rozmiar", 90, False),
+            ("status", "Status", 220, True),
+        ):
+            self.bulk_tree.heading(column, text=text, anchor="w")
+            self.bulk_tree.column(column, width=width, stretch=stretch, anchor="w")
+        self.bulk_tree.grid(row=1, column=0, sticky="nsew", padx=(12, 0), pady=(0, 12))
+        bulk_scroll = ttk.Scrollbar(results_card, orient="vertical", command=self.bulk_tree.yview)
+        bulk_scroll.grid(row=1, column=1, sticky="ns", padx=(0, 12), pady=(0, 12))
+        self.bulk_tree.configure(yscrollcommand=bulk_scroll.set)
+
+    def _build_history_tab(self):
+        frame = self.tab_history
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(2, weight=1)
+
+        header = ttk.Frame(frame)
+        header.grid(row=0, column=0, sticky="ew", padx=6, pady=(4, 12))
+        header.columnconfigure(0, weight=1)
+        ttk.Label(header, text="Historia", style="Title.TLabel").grid(row=0, column=0, sticky="w")
+        ttk.Label(
+            header, text="Szukaj po tytule, linku, ID filmu lub sciezce pliku.", style="Sub.TLabel"
+        ).grid(row=1, column=0, sticky="w")
+
+        card = ttk.Frame(frame, style="Card.TFrame")
+        card.grid(row=1, column=0, sticky="ew", padx=6, pady=(0, 12))
+        card.columnconfigure(0, weight=1)
+        self.history_query_var = tk.StringVar()
+        self.history_query_var.trace_add("write", lambda *_args: self._schedule_history_search())
+        ttk.Entry(card, textvariable=self.history_query_var).grid(row=0, column=0, sticky="ew", padx=12, pady=12)
+        self.history_status_var = tk.StringVar(value="Wszystkie")
+        status = ttk.Combobox(
+            card,
+            textvariable=self.history_status_var,
+            values=["Wszystkie"] + [STATE_LABELS[state] for state in FINISHED_STATES],
+            state="readonly",
+            width=12,
+        )
+        status.grid(row=0, column=1, sticky="w", padx=(0, 6), pady=12)
+        status.bind("<<ComboboxSelected>>", lambda _event: self._search_history())
+        ttk.Button(card, text="Eksport CSV...", command=self._export_history).grid(
+            row=0, column=2, sticky="e", padx=(0, 12), pady=12
+        )
+
+        results_card = ttk.Frame(frame, style="Card.TFrame")
+        results_card.grid(row=2, column=0, sticky="nsew", padx=6, pady=(0, 12))
+        results_card.columnconfigure(0, weight=1)
+        results_card.rowconfigure(1, weight=1)
+        self.history_count_var = tk.StringVar(value="")
+        ttk.Label(results_card, textvariable=self.history_count_var).grid(
+            row=0, column=0, sticky="w", padx=12, pady=(10, 4)
+        )
+        self.history_tree = ttk.Treeview(
+            results_card, columns=("date", "title", "quality", "status", "size", "path"), show="headings", height=10
+        )
+        for column, text, width, stretch in (
+            ("date", "Data", 130, False),
+            ("title", "Tytul", 240, True),
+            ("quality", "Jakosc", 60, False),
+            ("status", "Stan", 80, False),
+            ("size", "Rozmiar", 80, False),
+            ("path", "Plik / blad", 240, True),
+        ):
+            self.history_tree.heading(column, text=text, anchor="w")
+            self.history_tree.column(column, width=width, stretch=stretch, anchor="w")
+        self.history_tree.grid(row=1, column=0, sticky="nsew", padx=(12, 0), pady=(0, 12))
+        history_scroll = ttk.Scrollbar(results_card, orient="vertical", command=self.history_tree.yview)
+        history_scroll.grid(row=1, column=1, sticky="ns", padx=(0, 12), pady=(0, 12))
+
+        def _on_scroll(first, last):
+            history_scroll.set(first, last)
+            # Next page is fetched only when the list is scrolled to its end.
+            if float(last) >= 1.0 and self._history_cursor is not None:
+                self._load_history_page()
+
+        self.history_tree.configure(yscrollcommand=_on_scroll)
+
+    def _on_tab_changed(self, _event):
+        if self._notebook.select() == str(self.tab_history):
+            self._search_history()
+
+    def _history_filters(self) -> dict:
+        labels = {label: state for state, label in STATE_LABELS.items()}
+        return {
+            "text": self.history_query_var.get(),
+            "status": labels.get(self.history_status_var.get(), ""),
+        }
+
+    def _schedule_history_search(self):
+        # Typing restarts the timer, so only the last keystroke runs a query.
+        if self._history_search_after is not None:
+            self.after_cancel(self._history_search_after)
+        self._history_search_after = self.after(250, self._search_history)
+
+    def _search_history(self):
+        self._history_search_after = None
+        self.history_tree.delete(*self.history_tree.get_children())
+        self._history_cursor = ()
+        total = self._jobs.history.count(**self._history_filters())
+        self.history_count_var.set(f"Wyniki: {total}")
+        self._load_history_page()
+
+    def _load_history_page(self):
+        before = self._history_cursor or None
+        self._history_cursor = None
+        rows = self._jobs.history.search(before=before, limit=PAGE_SIZE, **self._history_filters())
+        for row in rows:
+            self.history_tree.insert(
+                "",
+                "end",
+                iid=str(row["id"]),
+                values=(
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(row["finished_at"])),
+                    row["title"] or row["url"],
+                    row["quality"] or "",
+                    STATE_LABELS.get(row["status"], row["status"]),
+                    format_size(row["bytes"]) if row["bytes"] else "",
+                    row["error"] or row["output_path"] or "",
+                ),
+            )
+        if len(rows) == PAGE_SIZE:
+            self._history_cursor = (rows[-1]["finished_at"], rows[-1]["id"])
+
+    def _export_history(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv", filetypes=[("CSV", "*.csv")], initialfile="historia.csv"
+        )
+        if not path:
+            return
+        try:
+            count = self._jobs.history.export_csv(path, **self._history_filters())
+        except OSError as exc:
+            messagebox.showerror("Historia", f"Nie udalo sie zapisac pliku: {exc}")
+            return
+        self._append_log(f"Wyeksportowano historie ({count} pozycji): {path}")
 
     def _build_settings_tab(self):
         frame = self.tab_settings
@@ -182,62 +524,212 @@ class App(tk.Tk):
         self.path_entry.grid(row=1, column=0, sticky="ew", padx=12, pady=(0, 12))
         ttk.Button(card, text="Wybierz...", command=self._choose_folder).grid(row=1, column=1, sticky="e", padx=12, pady=(0, 12))
 
+        ttk.Label(card, text="Rownoczesne pobierania:").grid(row=2, column=0, sticky="w", padx=12, pady=(0, 4))
+        self.workers_var = tk.IntVar(value=self.settings.max_workers)
+        ttk.Spinbox(card, from_=1, to=MAX_WORKERS_LIMIT, textvariable=self.workers_var, width=5, state="readonly").grid(
+            row=3, column=0, sticky="w", padx=12, pady=(0, 12)
+        )
+
+        ttk.Label(card, text="Limit pasma (MB/s, 0 = bez limitu):").grid(row=4, column=0, sticky="w", padx=12, pady=(0, 4))
+        self.bandwidth_var = tk.StringVar(value=f"{self.settings.bandwidth_limit_mbps:g}")
+        ttk.Entry(card, textvariable=self.bandwidth_var, width=8).grid(row=5, column=0, sticky="w", padx=12, pady=(0, 12))
+
+        ttk.Label(card, text="Archiwum pobranych (pomijanie duplikatow):").grid(
+            row=6, column=0, sticky="w", padx=12, pady=(0, 4)
+        )
+        self.rebuild_archive_btn = ttk.Button(card, text="Odbuduj z folderu zapisu", command=self._rebuild_archive)
+        self.rebuild_archive_btn.grid(row=7, column=0, sticky="w", padx=12, pady=(0, 12))
+
+        self.efficient_codecs_var = tk.BooleanVar(value=self.settings.prefer_efficient_codecs)
+        ttk.Checkbutton(
+            card, text="Preferuj AV1/VP9 zamiast H.264, gdy plik jest mniejszy o co najmniej (%):",
+            variable=self.efficient_codecs_var,
+        ).grid(row=8, column=0, sticky="w", padx=12, pady=(0, 4))
+        self.codec_savings_var = tk.StringVar(value=f"{self.settings.codec_min_savings_pct:g}")
+        ttk.Entry(card, textvariable=self.codec_savings_var, width=8).grid(
+            row=9, column=0, sticky="w", padx=12, pady=(0, 12)
+        )
+
+        ttk.Label(card, text="Folder tymczasowy (szybki dysk lokalny, puste = folder zapisu):").grid(
+            row=10, column=0, sticky="w", padx=12, pady=(0, 4)
+        )
+        self.staging_var = tk.StringVar()
+        ttk.Entry(card, textvariable=self.staging_var).grid(row=11, column=0, sticky="ew", padx=12, pady=(0, 12))
+        ttk.Button(card, text="Wybierz...", command=self._choose_staging_folder).grid(
+            row=11, column=1, sticky="e", padx=12, pady=(0, 12)
+        )
+
+        self.watch_clipboard_var = tk.BooleanVar(value=self.settings.watch_clipboard)
+        ttk.Checkbutton(
+            card, text="Obserwuj schowek (skopiowany link trafia do pola i jest od razu analizowany)",
+            variable=self.watch_clipboard_var,
+        ).grid(row=12, column=0, columnspan=2, sticky="w", padx=12, pady=(0, 12))
+
         ttk.Button(frame, text="Zapisz ustawienia", command=self._save_settings, style="Primary.TButton").grid(
             row=2, column=0, sticky="w", padx=6, pady=(0, 6)
         )
 
+        self.event_stats_var = tk.StringVar(value="")
+        ttk.Label(frame, textvariable=self.event_stats_var, style="Sub.TLabel").grid(
+            row=3, column=0, columnspan=2, sticky="w", padx=6, pady=(6, 6)
+        )
+
+    def _rebuild_archive(self):
+        output_dir = self.path_var.get().strip() or DEFAULT_OUTPUT
+        self.rebuild_archive_btn.configure(state="disabled")
+
+        def _run():
+            try:
+                count = self._jobs.archive.rebuild(output_dir)
+                self._events.post("archive_rebuilt", count)
+            except Exception as exc:
+                self._events.post("error", f"Nie udalo sie odbudowac archiwum: {exc}")
+                self._events.post("archive_rebuilt", None)
+
+        threading.Thread(target=_run, daemon=True).start()
+
     def _apply_settings_to_ui(self):
         self.path_var.set(self.settings.output_dir)
+        self.staging_var.set(self.settings.staging_dir)
 
     def _choose_folder(self):
         selected = filedialog.askdirectory(initialdir=self.path_var.get() or DEFAULT_OUTPUT)
         if selected:
             self.path_var.set(selected)
 
+    def _choose_staging_folder(self):
+        selected = filedialog.askdirectory(initialdir=self.staging_var.get() or self.path_var.get() or DEFAULT_OUTPUT)
+        if selected:
+            self.staging_var.set(selected)
+
     def _save_settings(self, show_message=True):
         self.settings.output_dir = self.path_var.get().strip() or DEFAULT_OUTPUT
+        self.settings.staging_dir = self.staging_var.get().strip()
+        self._jobs.staging_dir = self.settings.staging_dir
+        self.settings.max_workers = self.workers_var.get()
+        self._jobs.set_max_workers(self.settings.max_workers)
+        try:
+            self.settings.bandwidth_limit_mbps = max(0.0, float(self.bandwidth_var.get().replace(",", ".") or 0))
+        except ValueError:
+            messagebox.showerror("Ustawienia", "Niepoprawny limit pasma.")
+            return
+        try:
+            savings = float(self.codec_savings_var.get().replace(",", ".") or 0)
+        except ValueError:
+            messagebox.showerror("Ustawienia", "Niepoprawny prog oszczednosci.")
+            return
+        self.settings.codec_min_savings_pct = max(0.0, min(savings, 90.0))
+        self.settings.prefer_efficient_codecs = self.efficient_codecs_var.get()
+        self.settings.watch_clipboard = self.watch_clipboard_var.get()
+        self._jobs.format_policy = FormatPolicy.from_settings(self.settings)
+        self._jobs.bandwidth.configure(
+            limit=self.settings.bandwidth_limit_mbps * 1_000_000, schedule=self.settings.bandwidth_schedule
+        )
         self.settings_store.save(self.settings)
         if show_message:
             messagebox.showinfo("Ustawienia", "Ustawienia zapisane.")
 
     def _start_analyze(self):
-        if self._analyze_thread and self._analyze_thread.is_alive():
+        if self._analysis_requested:
             messagebox.showwarning("Analiza", "Analiza juz trwa.")
             return
         url = self.url_var.get().strip()
         if not url:
             messagebox.showerror("Blad", "Wklej link do YouTube.")
             return
-        self._clear_log()
-        self.progress_var.set(0)
+        if self._analysis and self._analysis.get("url") == url:
+            # Already analyzed in the background.
+            self.status_var.set("Analiza zakonczona.")
+            return
+        if not self._jobs.has_active():
+            self._clear_log()
+        self._analysis = None
+        self._analysis_requested = url
         self.download_btn.configure(state="disabled")
         self.quality_combo.configure(state="disabled")
         self.analyze_btn.configure(state="disabled")
-        self.status_var.set("Analizowanie linku...")
-        self._analyze_thread = threading.Thread(target=self._analyze_worker, args=(url,), daemon=True)
-        self._analyze_thread.start()
+        if is_yt_dlp_loaded():
+            self.status_var.set("Analizowanie linku...")
+        else:
+            # The worker waits for the background warm-up to finish before extracting.
+            self.status_var.set("Ladowanie yt-dlp, analiza zaraz sie rozpocznie...")
+        ready = self._speculative.result(url)
+        if ready is not None and not ready[1]:
+            self._handle_analyze_done((None, url) + ready)
+        else:
+            # Joins a background analysis of the same link if one is running.
+            self._speculative.submit(url)
 
-    def _analyze_worker(self, url: str):
-        try:
-            result = self._downloader.analyze(url)
-            self._queue.put(("analyze_ok", result))
-        except Exception as exc:
-            self._queue.put(("error", str(exc)))
+    def _on_url_changed(self, *_args):
+        url = self.url_var.get().strip()
+        if self._analysis and self._analysis.get("url") != url and not self.batch_var.get():
+            # Qualities and sizes of the previous link no longer apply.
+            self._analysis = None
+            self.quality_combo.configure(values=["auto"], state="disabled")
+            self.quality_var.set("auto")
+            self.expected_size_var.set("")
+            self.download_btn.configure(state="disabled")
+        if self._analysis_requested and self._analysis_requested != url:
+            self._analysis_requested = None
+            self.analyze_btn.configure(state="normal" if not self.batch_var.get() else "disabled")
+        # Every keystroke restarts the timer, so only the link the user settles on is analyzed.
+        if self._url_after is not None:
+            self.after_cancel(self._url_after)
+        self._url_after = self.after(DEBOUNCE_MS, self._speculate)
 
-    def _start_download(self):
-        if self._download_thread and self._download_thread.is_alive():
-            messagebox.showwarning("Pobieranie", "Pobieranie juz trwa.")
+    def _speculate(self):
+        self._url_after = None
+        url = self.url_var.get().strip()
+        if self.batch_var.get() or not looks_like_url(url):
+            self._speculative.cancel()
+            return
+        if self._analysis and self._analysis.get("url") == url:
             return
+        if self._speculative.submit(url) and not self._analysis_requested and not self._jobs.has_active():
+            self.status_var.set("Analizowanie linku w tle...")
 
+    def _poll_clipboard(self):
+        if self._closing:
+            return
+        if not self.settings.watch_clipboard:
+            self._clipboard_seen = None
+        else:
+            try:
+                text = self.clipboard_get().strip()
+            except tk.TclError:
+                text = ""
+            if text != self._clipboard_seen:
+                # Whatever was in the clipboard when watching started is not a new copy.
+                first = self._clipboard_seen is None
+                self._clipboard_seen = text
+                current = self.url_var.get().strip()
+                # Never overwrites a link the user typed, only an empty field or an earlier clipboard link.
+                if not first and looks_like_url(text) and text != current and current in ("", self._clipboard_url):
+                    self._clipboard_url = text
+                    self.url_var.set(text)
+                    self._append_log(f"Link ze schowka: {text}")
+        self.after(CLIPBOARD_POLL_MS, self._poll_clipboard)
+
+    def _start_download(self):
         url = self.url_var.get().strip()
         if not url:
             messagebox.showerror("Blad", "Wklej link do YouTube.")
             return
 
         self._save_settings(show_message=False)
-        self.progress_var.set(0)
-        self._clear_log()
-        self.status_var.set("Pobieranie...")
+
+        if self.batch_var.get():
+            self._jobs.enqueue_playlist(
+                DownloadOptions(
+                    url=url,
+                    output_dir=self.settings.output_dir,
+                    quality=self.quality_var.get() or "auto",
+                    fmt=self.format_var.get(),
+                )
+            )
+            self._append_log(f"Wyliczanie pozycji playlisty: {url}")
+            self.url_var.set("")
+            return
 
         options = DownloadOptions(
             url=url,
@@ -246,56 +738,274 @@ class App(tk.Tk):
             fmt=self.format_var.get(),
         )
 
-        self._download_thread = threading.Thread(target=self._download_worker, args=(options,), daemon=True)
-        self._download_thread.start()
+        title = ""
+        if self._analysis and self._analysis.get("url") == url:
+            options.info = self._analysis.get("info")
+            title = self._analysis.get("title") or ""
+            selection = self._selected_formats()
+            if selection:
+                # Pinned here so the job downloads exactly what the size estimate was computed for.
+                options.format_ids = selection.format_ids
+                self._append_log(f"Przewidywany rozmiar: {selection.describe()}")
+        job = self._jobs.enqueue(options, title=title)
+        self._append_log(f"Dodano do kolejki: {job.label}")
+        self._reset_ui()
 
-    def _download_worker(self, options: DownloadOptions):
-        try:
-            self._downloader.download(options)
-            self._queue.put(("done", "Gotowe."))
-        except Exception as exc:
-            msg = str(exc)
-            if "Cancelled by user" in msg:
-                self._downloader.cleanup_temp()
-                self._queue.put(("error", "Anulowano"))
-            else:
-                self._queue.put(("error", msg))
-
-    def _on_progress(self, percent):
-        self._queue.put(("progress", percent))
+    def _start_bulk_analyze(self):
+        if self._bulk_thread and self._bulk_thread.is_alive():
+            messagebox.showwarning("Analiza", "Analiza juz trwa.")
+            return
+        urls = list(dict.fromkeys(line.strip() for line in self.bulk_text.get("1.0", "end").splitlines() if line.strip()))
+        if not urls:
+            messagebox.showerror("Blad", "Wklej co najmniej jeden link.")
+            return
+        self.bulk_tree.delete(*self.bulk_tree.get_children())
+        self._bulk_results = {}
+        self._bulk_enqueued = set()
+        self.bulk_analyze_btn.configure(state="disabled")
+        self.bulk_cancel_btn.configure(state="normal")
+        self.bulk_status_var.set(f"Analiza: 0 / {len(urls)}")
+
+        def _run():
+            started = time.perf_counter()
+            try:
+                for item in self._bulk.run(urls):
+                    self._events.post("bulk_result", item)
+            except Exception as exc:
+                self._events.post("error", f"Analiza wielu linkow przerwana: {exc}")
+            self._events.post("bulk_done", (len(urls), time.perf_counter() - started))
+
+        self._bulk_thread = threading.Thread(target=_run, daemon=True)
+        self._bulk_thread.start()
+
+    def _cancel_bulk_analyze(self):
+        self._bulk.cancel()
+        self.bulk_cancel_btn.configure(state="disabled")
+
+    def _handle_bulk_result(self, item):
+        iid = str(len(self._bulk_results))
+        self._bulk_results[iid] = item
+        if item.error:
+            values = (item.url, "", "", item.error)
+        else:
+            title = item.result.get("title") or item.url
+            qualities = ", ".join(item.result.get("available_qualities") or []) or "auto"
+            values = (title, qualities, self._bulk_size(item), f"OK ({item.elapsed_s:.1f}s)")
+        self.bulk_tree.insert("", "end", iid=iid, values=values)
+
+    def _handle_bulk_done(self, value):
+        total, elapsed = value
+        failed = sum(1 for item in self._bulk_results.values() if item.error)
+        self.bulk_status_var.set(
+            f"Przeanalizowano {len(self._bulk_results)} / {total} w {elapsed:.1f}s, bledy: {failed}"
+        )
+        self.bulk_analyze_btn.configure(state="normal")
+        self.bulk_cancel_btn.configure(state="disabled")
+
+    def _bulk_size(self, item) -> str:
+        index = item.result.get("formats") if item.result else None
+        selection = index.select(self.bulk_quality_var.get(), FormatPolicy.from_settings(self.settings)) if index else None
+        return format_size(selection.size) if selection and selection.size else ""
+
+    def _refresh_bulk_sizes(self):
+        for iid, item in self._bulk_results.items():
+            if not item.error and self.bulk_tree.exists(iid):
+                self.bulk_tree.set(iid, "size", self._bulk_size(item))
+
+    def _enqueue_bulk(self):
+        quality = self.bulk_quality_var.get() or "auto"
+        policy = FormatPolicy.from_settings(self.settings)
+        added = 0
+        for iid, item in self._bulk_results.items():
+            if item.error or not item.result or iid in self._bulk_enqueued:
+                continue
+            options = DownloadOptions(
+                url=item.url,
+                output_dir=self.settings.output_dir,
+                quality=quality,
+                fmt="mp4",
+                info=item.result.get("info"),
+            )
+            index = item.result.get("formats")
+            selection = index.select(quality, policy) if index else None
+            if selection:
+                options.format_ids = selection.format_ids
+            self._jobs.enqueue(options, title=item.result.get("title") or "")
+            self._bulk_enqueued.add(iid)
+            if self.bulk_tree.exists(iid):
+                self.bulk_tree.set(iid, "status", "Dodano do kolejki")
+            added += 1
+        if added:
+            self._append_log(f"Dodano do kolejki z listy linkow: {added}")
+
+    def _selected_job_id(self):
+        selection = self.jobs_tree.selection()
+        if not selection:
+            return None
+        return int(selection[0])
+
+    def _pause_job(self):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self._jobs.pause(job_id)
+
+    def _resume_job(self):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self._jobs.resume(job_id)
+
+    def _cancel_job(self):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self._jobs.cancel(job_id)
+
+    def _move_job(self, offset: int):
+        job_id = self._selected_job_id()
+        if job_id is not None and self._jobs.move(job_id, offset):
+            self._sync_job_order()
+
+    def _change_priority(self, offset: int):
+        job_id = self._selected_job_id()
+        if job_id is not None:
+            self._jobs.set_priority(job_id, offset)
+
+    def _refresh_allocations(self):
+        allocations = self._jobs.allocations()
+        for job in self._jobs.jobs():
+            iid = str(job.id)
+            if self.jobs_tree.exists(iid):
+                self.jobs_tree.set(iid, "limit", self._format_allocation(job.id, allocations))
+        if not self._closing:
+            self.after(1000, self._refresh_allocations)
+
+    def _format_allocation(self, job_id, allocations) -> str:
+        if job_id not in allocations:
+            return ""
+        rate = allocations[job_id]
+        return f"{rate / 1_000_000:.1f}mb/s" if rate else "bez limitu"
+
+    def _clear_finished_jobs(self):
+        for job in self._jobs.clear_finished():
+            if self.jobs_tree.exists(str(job.id)):
+                self.jobs_tree.delete(str(job.id))
+        self._update_overall_status()
+
+    def _sync_job_order(self):
+        for index, job in enumerate(self._jobs.jobs()):
+            if self.jobs_tree.exists(str(job.id)):
+                self.jobs_tree.move(str(job.id), "", index)
 
     def _on_log(self, message):
-        self._queue.put(("log", message))
+        self._events.post("log", message)
+
+    def _on_job_update(self, job):
+        self._events.post("job", job, key=job.id)
 
-    def _on_status(self, message):
-        self._queue.put(("status", message))
+    def _on_job_log(self, job, message):
+        if job is None:
+            self._events.post("log", message)
+        else:
+            self._events.post("log", f"[{job.id}] {message}")
 
     def _poll_queue(self):
-        try:
-            while True:
-                item = self._queue.get_nowait()
-                kind, value = item
-                if kind == "progress":
-                    self.progress_var.set(value)
-                elif kind == "log":
-                    self._append_log(value)
-                elif kind == "status":
-                    self.status_var.set(value)
-                elif kind == "error":
-                    self._append_log(f"Blad: {value}")
-                    messagebox.showerror("Blad", value)
-                    self.analyze_btn.configure(state="normal")
-                    if value == "Anulowano":
-                        self._reset_ui()
-                elif kind == "done":
-                    self._append_log(value)
-                    messagebox.showinfo("Pobieranie", value)
-                    self._reset_ui()
-                elif kind == "analyze_ok":
-                    self._handle_analyze_result(value)
-        except queue.Empty:
-            pass
-        self.after(100, self._poll_queue)
+        batch = self._events.drain()
+        if batch.logs:
+            self._log_view.append(batch.logs)
+        jobs_changed = False
+        for kind, value in batch.updates:
+            if kind == "job":
+                self._update_job_row(value)
+                jobs_changed = True
+        if jobs_changed:
+            self._update_overall_status()
+        for kind, value in batch.events:
+            if kind == "error":
+                self._append_log(f"Blad: {value}")
+                messagebox.showerror("Blad", value)
+                self.analyze_btn.configure(state="normal")
+            elif kind == "analyze_done":
+                self._handle_analyze_done(value)
+            elif kind == "bulk_result":
+                self._handle_bulk_result(value)
+            elif kind == "bulk_done":
+                self._handle_bulk_done(value)
+            elif kind == "archive_rebuilt":
+                self.rebuild_archive_btn.configure(state="normal")
+                if value is not None:
+                    self._append_log(f"Archiwum odbudowane, pozycji: {value}")
+            elif kind == "warm_done":
+                self._on_warm_done()
+                if self._startup_report:
+                    return
+        self._update_event_stats()
+        self.after(self._events.interval_ms, self._poll_queue)
+
+    def _update_event_stats(self):
+        stats = self._events.stats()
+        text = (
+            f"Zdarzenia UI: {stats['posted']}, scalone: {stats['merged']}, "
+            f"odrzucone: {stats['dropped']}, paczki: {stats['batches']}"
+        )
+        merge = self._jobs.postprocess.stats()
+        text += (
+            f"\nScalanie: w kolejce {merge['queued']}, w toku {merge['running']}, "
+            f"sr. oczekiwanie {merge['avg_wait_s']:.1f}s, sr. czas {merge['avg_run_s']:.1f}s"
+        )
+        if text != self.event_stats_var.get():
+            self.event_stats_var.set(text)
+
+    def _update_job_row(self, job):
+        iid = str(job.id)
+        values = (
+            job.label,
+            job.options.quality,
+            STATE_LABELS.get(job.state, job.state),
+            f"{job.progress:.1f}%",
+            f"{job.priority:+d}" if job.priority else "0",
+            self._format_allocation(job.id, self._jobs.allocations()),
+            job.error or job.status,
+        )
+        if self.jobs_tree.exists(iid):
+            self.jobs_tree.item(iid, values=values)
+        else:
+            self.jobs_tree.insert("", "end", iid=iid, values=values)
+
+    def _update_overall_status(self):
+        if self._closing:
+            return
+        jobs = [job for job in self._jobs.jobs() if job.state not in FINISHED_STATES]
+        if not jobs:
+            self.progress_var.set(0)
+            if not self._analysis_requested:
+                self.status_var.set("Gotowy.")
+            return
+        self.progress_var.set(sum(job.progress for job in jobs) / len(jobs))
+        running = sum(1 for job in jobs if job.state == RUNNING)
+        queued = sum(1 for job in jobs if job.state == QUEUED)
+        paused = sum(1 for job in jobs if job.state == PAUSED)
+        merging = sum(1 for job in jobs if job.state == MERGING)
+        self.status_var.set(
+            f"Pobieranie: {running}, scalanie: {merging}, w kolejce: {queued}, wstrzymane: {paused}"
+        )
+
+    def _handle_analyze_done(self, value):
+        generation, url, result, error = value
+        # Results for a link the user has since changed or abandoned are dropped.
+        if generation is not None and not self._speculative.is_current(generation):
+            return
+        if url != self.url_var.get().strip() or self.batch_var.get():
+            return
+        requested = self._analysis_requested == url
+        self._analysis_requested = None
+        if error:
+            self.analyze_btn.configure(state="normal")
+            if requested:
+                self._append_log(f"Blad: {error}")
+                messagebox.showerror("Blad", error)
+            elif not self._jobs.has_active():
+                self.status_var.set("Analiza w tle nie powiodla sie. Kliknij Analizuj, aby zobaczyc blad.")
+            return
+        self._handle_analyze_result(result)
 
     def _handle_analyze_result(self, result):
         available = result.get("available_qualities") or []
@@ -307,47 +1017,82 @@ class App(tk.Tk):
         self.quality_combo.configure(values=available, state="readonly")
         self.quality_var.set(available[0])
         title = result.get("title") or ""
+        self._analysis = result
         if title:
             self._append_log(f"Tytul: {title}")
         self._append_log("Dostepne jakosci (MP4): " + ", ".join(available))
+        self._update_expected_size()
         self.download_btn.configure(state="normal")
         self.analyze_btn.configure(state="normal")
         self.status_var.set("Analiza zakonczona.")
 
+    def _selected_formats(self):
+        index = self._analysis.get("formats") if self._analysis else None
+        if index is None or self.batch_var.get():
+            return None
+        return index.select(self.quality_var.get() or "auto", FormatPolicy.from_settings(self.settings))
+
+    def _update_expected_size(self):
+        selection = self._selected_formats()
+        self.expected_size_var.set(f"Przewidywany rozmiar: {selection.describe()}" if selection else "")
+
     def _append_log(self, message):
-        self.log_text.configure(state="normal")
-        self.log_text.insert("end", message + "\n")
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+        self._log_view.append([message])
 
     def _clear_log(self):
-        self.log_text.configure(state="normal")
-        self.log_text.delete("1.0", "end")
-        self.log_text.configure(state="disabled")
+        self._log_view.clear()
 
     def _reset_ui(self):
         self.url_var.set("")
         self.quality_combo.configure(values=["auto"], state="disabled")
         self.quality_var.set("auto")
-        self.progress_var.set(0)
+        self._analysis = None
+        self.expected_size_var.set("")
         self.download_btn.configure(state="disabled")
         self.analyze_btn.configure(state="normal")
-        self.status_var.set("Gotowy.")
+        self._on_batch_toggle()
+        self._update_overall_status()
+
+    def _on_batch_toggle(self):
+        # Playlist entries are resolved one by one when downloaded, so no analysis is needed upfront.
+        if self.batch_var.get():
+            self._speculative.cancel()
+            values = ["auto"] + STANDARD_QUALITIES
+            self.quality_combo.configure(values=values, state="readonly")
+            self.quality_var.set("auto")
+            self.expected_size_var.set("")
+            self.download_btn.configure(state="normal")
+            self.analyze_btn.configure(state="disabled")
+        elif self._analysis is None:
+            self.quality_combo.configure(values=["auto"], state="disabled")
+            self.quality_var.set("auto")
+            self.download_btn.configure(state="disabled")
+            self.analyze_btn.configure(state="normal")
+            self._speculate()
 
     def _on_close(self):
-        if self._download_thread and self._download_thread.is_alive():
-            confirm = messagebox.askyesno("Zamknac?", "Trwa pobieranie. Na pewno przerwac?")
+        active = self._jobs.has_active()
+        if active:
+            confirm = messagebox.askyesno(
+                "Zamknac?", "Trwa pobieranie. Przerwac? Pobieranie bedzie mozna wznowic po ponownym uruchomieniu."
+            )
             if not confirm:
                 return
-            self.status_var.set("Anulowanie pobierania...")
-            self._downloader.cancel()
+        self._bulk.cancel()
+        if active:
+            self.status_var.set("Przerywanie pobierania...")
+            self._close_started = time.perf_counter()
+            self._jobs.shutdown()
             self._closing = True
-            self.after(200, self._wait_close)
+            self.after(50, self._wait_close)
             return
+        self._jobs.history.close()
         self.destroy()
 
     def _wait_close(self):
-        if self._download_thread and self._download_thread.is_alive():
-            self.after(200, self._wait_close)
+        if not self._jobs.is_idle():
+            self.after(50, self._wait_close)
             return
+        file_logger().info(f"Zamykanie: pobierania zatrzymane po {time.perf_counter() - self._close_started:.2f}s")
+        self._jobs.history.close()
         self.destroy()
@@ -0,0 +1,219 @@
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from settings import HISTORY_FILE
+
+PAGE_SIZE = 100
+# The writer commits whatever has arrived after this long, or as soon as a batch is full.
+FLUSH_INTERVAL = 1.0
+MAX_BATCH = 500
+# Substring search goes through an FTS5 trigram index, which needs at least this many characters.
+MIN_INDEXED_QUERY = 3
+COLUMNS = (
+    "finished_at",
+    "url",
+    "extractor",
+    "video_id",
+    "title",
+    "quality",
+    "format_ids",
+    "status",
+    "error",
+    "output_path",
+    "bytes",
+    "duration_s",
+)
+_STOP = object()
+
+
+class DownloadHistory:
+    # Every job that finished, failed or was cancelled, in SQLite. add() only queues the row, so
+    # worker threads never wait on the disk; a single writer thread commits them in batches.
+    def __init__(self, path=HISTORY_FILE, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._fts = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                " id INTEGER PRIMARY KEY,"
+                " finished_at REAL NOT NULL,"
+                " url TEXT NOT NULL,"
+                " extractor TEXT,"
+                " video_id TEXT,"
+                " title TEXT,"
+                " quality TEXT,"
+                " format_ids TEXT,"
+                " status TEXT NOT NULL,"
+                " error TEXT,"
+                " output_path TEXT,"
+                " bytes INTEGER,"
+                " duration_s REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS downloads_finished ON downloads(finished_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS downloads_video ON downloads(video_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS downloads_status ON downloads(status, finished_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS downloads_path ON downloads(output_path)")
+            try:
+                existed = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'downloads_text'"
+                ).fetchone()
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS downloads_text USING fts5("
+                    " title, url, output_path, content='downloads', content_rowid='id', tokenize='trigram')"
+                )
+                conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS downloads_text_insert AFTER INSERT ON downloads BEGIN"
+                    " INSERT INTO downloads_text(rowid, title, url, output_path)"
+                    " VALUES (new.id, new.title, new.url, new.output_path); END"
+                )
+                if not existed:
+                    conn.execute("INSERT INTO downloads_text(downloads_text) VALUES ('rebuild')")
+                self._fts = True
+            except sqlite3.OperationalError:
+                # SQLite without FTS5 / trigram (before 3.34): searches fall back to LIKE scans.
+                pass
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL keeps searches from the UI thread off the writer's lock.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, **record):
+        record.setdefault("finished_at", time.time())
+        self._queue.put(tuple(record.get(column) for column in COLUMNS))
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=30)
+            except queue.Empty:
+                # Idle writers exit; add() starts a new one when needed.
+                with self._writer_lock:
+                    if self._queue.empty():
+                        self._writer = None
+                        return
+                continue
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= MAX_BATCH:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            if item is _STOP:
+                return
+
+    def _write(self, batch):
+        if not batch:
+            return
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        try:
+            with self._connect() as conn:
+                conn.executemany(f"INSERT INTO downloads ({', '.join(COLUMNS)}) VALUES ({placeholders})", batch)
+        except sqlite3.Error:
+            # History is informational; a locked or broken file must not take a worker down.
+            pass
+
+    def close(self):
+        # Commits everything queued so far; called on exit.
+        with self._writer_lock:
+            writer = self._writer
+            self._writer = None
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join(timeout=10)
+        else:
+            batch = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+            self._write(batch)
+
+    def _where(self, text: str = "", status: str = "", since: float = None, until: float = None):
+        clauses, params = [], []
+        text = (text or "").strip()
+        if text and self._fts and len(text) >= MIN_INDEXED_QUERY:
+            clauses.append("(video_id = ? OR id IN (SELECT rowid FROM downloads_text WHERE downloads_text MATCH ?))")
+            params += [text, '"' + text.replace('"', '""') + '"']
+        elif text:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append(
+                "(video_id = ? OR title LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\' OR output_path LIKE ? ESCAPE '\\')"
+            )
+            params += [text, pattern, pattern, pattern]
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("finished_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("finished_at < ?")
+            params.append(until)
+        return clauses, params
+
+    def search(self, text: str = "", status: str = "", since: float = None, until: float = None, before=None,
+               limit: int = PAGE_SIZE):
+        # Newest first. Pages are keyset-based: pass the last row's (finished_at, id) as before=
+        # to get the next page, so deep pages cost the same as the first.
+        clauses, params = self._where(text, status, since, until)
+        if before is not None:
+            clauses.append("(finished_at < ? OR (finished_at = ? AND id < ?))")
+            params += [before[0], before[0], before[1]]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT id, {', '.join(COLUMNS)} FROM downloads {where} ORDER BY finished_at DESC, id DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, text: str = "", status: str = "", since: float = None, until: float = None) -> int:
+        clauses, params = self._where(text, status, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._connect().execute(f"SELECT COUNT(*) FROM downloads {where}", params).fetchone()[0]
+
+    def export_csv(self, path: str, text: str = "", status: str = "", since: float = None, until: float = None) -> int:
+        # Streams rows straight from the cursor, oldest first, with ISO dates for spreadsheets.
+        clauses, params = self._where(text, status, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self._connect().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM downloads {where} ORDER BY finished_at, id", params
+        )
+        count = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for row in cursor:
+                row = list(row)
+                row[0] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[0]))
+                writer.writerow(row)
+                count += 1
+        return count
@@ -0,0 +1,680 @@
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+from bandwidth import MAX_PRIORITY, MIN_PRIORITY
+from downloader import Downloader, DownloadOptions
+from postprocess import MergeTask
+from retry import EXPIRED, PERMANENT, REASONS, THROTTLED, TRANSIENT, classify, error_text, host_key
+from settings import DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+
+# Playlist producers stop enumerating while this many entries are still waiting in the queue.
+MAX_PENDING_ENTRIES = 20
+# Idle workers look again this often while jobs wait for a retry or a host's circuit breaker.
+RETRY_POLL_S = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+# Bytes are on disk and the job waits for / runs its FFmpeg merge; it no longer holds a download slot.
+MERGING = "merging"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+STATE_LABELS = {
+    QUEUED: "W kolejce",
+    RUNNING: "Pobieranie",
+    MERGING: "Scalanie",
+    PAUSED: "Wstrzymane",
+    DONE: "Gotowe",
+    FAILED: "Blad",
+    CANCELLED: "Anulowane",
+}
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class DownloadJob:
+    id: int
+    options: DownloadOptions
+    title: str = ""
+    state: str = QUEUED
+    progress: float = 0.0
+    status: str = ""
+    error: str = ""
+    stats: dict = field(default_factory=dict)
+    journal_id: str = ""
+    priority: int = 0
+    weight: float = 1.0
+    # perf_counter() of a pause / cancel / shutdown that still has to stop a download or merge.
+    cancel_requested_at: float = 0.0
+    # time.monotonic() before which a job waiting to be retried is not started again.
+    retry_at: float = 0.0
+    # Retry counters summed over all attempts; copied into stats after each one.
+    retry_stats: dict = field(default_factory=dict)
+    downloader: Downloader = field(default=None, repr=False)
+
+    @property
+    def label(self) -> str:
+        return self.title or self.options.url
+
+
+class JobQueue:
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, on_update=None, on_log=None, cache=None, sessions=None,
+                 journal=None, bandwidth=None, archive=None, metrics=None, postprocess=None, format_policy=None,
+                 history=None, staging_dir="", retry=None):
+        self.on_update = on_update
+        self.on_log = on_log
+        self.cache = cache
+        self.sessions = sessions
+        # Optional journal.JobJournal; unfinished jobs survive restarts and crashes through it.
+        self.journal = journal
+        # Optional bandwidth.BandwidthManager shared by all running jobs.
+        self.bandwidth = bandwidth
+        # Optional archive.DownloadArchive; videos already in it are skipped before extraction.
+        self.archive = archive
+        # Optional metrics.MetricsExporter; receives every job that stops running.
+        self.metrics = metrics
+        # Optional postprocess.PostProcessor; merges run there instead of on the download workers.
+        self.postprocess = postprocess
+        # Optional history.DownloadHistory; gets a row for every job that finishes, fails or is cancelled.
+        self.history = history
+        # Local directory for temporary files (empty = write into each job's output_dir); read when a job starts.
+        self.staging_dir = staging_dir
+        # formats.FormatPolicy for jobs that are not pinned to exact format IDs; read when a job starts.
+        self.format_policy = format_policy
+        # Optional retry.RetryPolicy: failed jobs are classified and queued again with backoff, and
+        # hosts that keep failing are paused by its circuit breaker.
+        self.retry = retry
+        if metrics is not None:
+            metrics.gauges = self.counts
+            if postprocess is not None:
+                metrics.merge_stats = postprocess.stats
+        self._cond = threading.Condition()
+        self._jobs = []
+        self._ids = itertools.count(1)
+        self._workers = []
+        self._running = 0
+        self._stopping = False
+        self._producers = []
+        self._max_workers = max(1, min(int(max_workers), MAX_WORKERS_LIMIT))
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def start(self):
+        with self._cond:
+            self._stopping = False
+            self._spawn_workers()
+
+    def set_max_workers(self, count: int):
+        with self._cond:
+            self._max_workers = max(1, min(int(count), MAX_WORKERS_LIMIT))
+            self._spawn_workers()
+            self._cond.notify_all()
+
+    def enqueue(self, options: DownloadOptions, title: str = "", journal_id: str = "", state: str = QUEUED):
+        with self._cond:
+            job = DownloadJob(id=next(self._ids), options=options, title=title, state=state)
+            if self.journal:
+                job.journal_id = journal_id or self.journal.new_id()
+            self._jobs.append(job)
+            self._cond.notify_all()
+        self._record(job)
+        self._notify(job)
+        return job
+
+    def restore(self, entries, paused: bool = False):
+        jobs = []
+        for entry in entries:
+            options = DownloadOptions(
+                url=entry["url"],
+                output_dir=entry["output_dir"],
+                quality=entry.get("quality") or "auto",
+                fmt=entry.get("fmt") or "mp4",
+                format_ids=entry.get("format_ids") or "",
+            )
+            jobs.append(
+                self.enqueue(
+                    options,
+                    title=entry.get("title") or "",
+                    journal_id=entry["id"],
+                    state=PAUSED if paused else QUEUED,
+                )
+            )
+        return jobs
+
+    def enqueue_playlist(self, options: DownloadOptions, max_pending: int = MAX_PENDING_ENTRIES):
+        producer = threading.Thread(target=self._produce_entries, args=(options, max_pending), daemon=True)
+        with self._cond:
+            self._producers = [t for t in self._producers if t.is_alive()]
+            self._producers.append(producer)
+        producer.start()
+        return producer
+
+    def _produce_entries(self, options: DownloadOptions, max_pending: int):
+        lister = Downloader(log_cb=lambda message: self._log_batch(message))
+        count = 0
+        skipped = 0
+        try:
+            for entry in lister.iter_entries(options.url):
+                if self.archive and self.archive.contains(entry["extractor"], entry["id"], options.quality):
+                    skipped += 1
+                    continue
+                with self._cond:
+                    while not self._stopping and self._pending_count() >= max_pending:
+                        self._cond.wait()
+                    if self._stopping:
+                        lister.cancel()
+                        break
+                self.enqueue(replace(options, url=entry["url"], info=None), title=entry["title"])
+                count += 1
+        except Exception as exc:
+            self._log_batch(f"Blad playlisty: {exc}")
+        self._log_batch(f"Dodano pozycji z playlisty: {count}")
+        if skipped:
+            self._log_batch(f"Pominieto juz pobrane: {skipped}")
+
+    def is_producing(self) -> bool:
+        with self._cond:
+            return any(t.is_alive() for t in self._producers)
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs)
+
+    def get(self, job_id: int):
+        with self._cond:
+            return self._find(job_id)
+
+    def pause(self, job_id: int) -> bool:
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job.state not in (QUEUED, RUNNING):
+                return False
+            downloader = job.downloader if job.state == RUNNING else None
+            job.state = PAUSED
+            if downloader:
+                job.cancel_requested_at = time.perf_counter()
+        if downloader:
+            self._interrupt(job, downloader)
+        self._record(job)
+        self._notify(job)
+        return True
+
+    def resume(self, job_id: int) -> bool:
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job.state != PAUSED:
+                return False
+            # A paused job may still be unwinding on its worker; it is picked up again once released.
+            job.state = QUEUED
+            job.status = ""
+            job.retry_at = 0.0
+            self._cond.notify_all()
+        self._record(job)
+        self._notify(job)
+        return True
+
+    def cancel(self, job_id: int) -> bool:
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            was_running = job.state in (RUNNING, MERGING)
+            was_merging = job.state == MERGING
+            downloader = job.downloader if was_running else None
+            # Jobs a worker still holds (running, or paused and unwinding) get their history row there.
+            idle = job.downloader is None and not was_merging
+            job.state = CANCELLED
+            if was_running:
+                job.cancel_requested_at = time.perf_counter()
+        if idle:
+            self._record_history(job, {})
+        if downloader:
+            self._interrupt(job, downloader)
+        if was_merging:
+            # The merge callback discards the parts once FFmpeg has stopped.
+            self.postprocess.cancel(job.id)
+        if not was_running and self.journal:
+            # A running job is cleaned up by its worker once the download has stopped.
+            self.journal.discard(job.journal_id)
+        self._notify(job)
+        return True
+
+    def move(self, job_id: int, offset: int) -> bool:
+        with self._cond:
+            job = self._find(job_id)
+            if job is None:
+                return False
+            index = self._jobs.index(job)
+            target = max(0, min(len(self._jobs) - 1, index + offset))
+            if target == index:
+                return False
+            self._jobs.insert(target, self._jobs.pop(index))
+        return True
+
+    def set_priority(self, job_id: int, offset: int) -> bool:
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.priority = max(MIN_PRIORITY, min(MAX_PRIORITY, job.priority + offset))
+        if self.bandwidth:
+            self.bandwidth.update(job.id, priority=job.priority)
+        self._notify(job)
+        return True
+
+    def set_weight(self, job_id: int, weight: float) -> bool:
+        # Relative bandwidth share (1.0 = equal); priority steps multiply it.
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.weight = max(0.01, float(weight))
+        if self.bandwidth:
+            self.bandwidth.update(job.id, weight=job.weight)
+        self._notify(job)
+        return True
+
+    def allocations(self) -> dict:
+        return self.bandwidth.allocations() if self.bandwidth else {}
+
+    def clear_finished(self):
+        with self._cond:
+            removed = [job for job in self._jobs if job.state in FINISHED_STATES]
+            self._jobs = [job for job in self._jobs if job.state not in FINISHED_STATES]
+        return removed
+
+    def counts(self):
+        with self._cond:
+            result = {state: 0 for state in STATE_LABELS}
+            for job in self._jobs:
+                result[job.state] += 1
+            return result
+
+    def has_active(self) -> bool:
+        with self._cond:
+            return any(job.state in (QUEUED, RUNNING, MERGING) for job in self._jobs) or any(
+                t.is_alive() for t in self._producers
+            )
+
+    def _pending_count(self) -> int:
+        return sum(1 for job in self._jobs if job.state == QUEUED)
+
+    def is_idle(self) -> bool:
+        with self._cond:
+            if self._running:
+                return False
+        return self.postprocess is None or self.postprocess.is_idle()
+
+    def shutdown(self):
+        # Running jobs are interrupted, not discarded: partial files and journal entries are kept
+        # so the jobs can be resumed after a restart.
+        with self._cond:
+            self._stopping = True
+            interrupted = []
+            for job in self._jobs:
+                if job.state in (RUNNING, MERGING):
+                    job.state = PAUSED
+                    job.cancel_requested_at = time.perf_counter()
+                    interrupted.append((job, job.downloader))
+            self._cond.notify_all()
+        for job, downloader in interrupted:
+            if downloader:
+                self._interrupt(job, downloader)
+        if self.postprocess:
+            # Interrupted merges go back to PAUSED in their callback; the parts stay for the restart.
+            self.postprocess.shutdown()
+        for job, _downloader in interrupted:
+            self._notify(job)
+
+    def _interrupt(self, job: DownloadJob, downloader: Downloader):
+        # Outside the queue lock: cancel() shuts sockets down, and unregistering wakes a transfer
+        # that is waiting for its bandwidth share.
+        downloader.cancel()
+        if self.bandwidth:
+            self.bandwidth.unregister(job.id)
+
+    def _stop_latency(self, job: DownloadJob) -> str:
+        # Cancel-to-idle: from the request until the download or merge has let go of the job.
+        if not job.cancel_requested_at:
+            return ""
+        job.stats["cancel_s"] = time.perf_counter() - job.cancel_requested_at
+        job.cancel_requested_at = 0.0
+        return f" (zatrzymano po {job.stats['cancel_s']:.2f}s)"
+
+    def _spawn_workers(self):
+        self._workers = [t for t in self._workers if t.is_alive()]
+        while len(self._workers) < self._max_workers:
+            worker = threading.Thread(target=self._worker, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _find(self, job_id: int):
+        for job in self._jobs:
+            if job.id == job_id:
+                return job
+        return None
+
+    def _next_job(self):
+        if self._running >= self._max_workers:
+            return None
+        now = time.monotonic()
+        for job in self._jobs:
+            if job.state != QUEUED or job.downloader is not None or job.retry_at > now:
+                continue
+            # Jobs for a host whose breaker is open stay queued; the slot goes to another host.
+            if self.retry and not self.retry.breaker.allow(host_key(job.options.url)):
+                continue
+            return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._stopping:
+                    self._cond.wait(RETRY_POLL_S if self.retry else None)
+                    job = self._next_job()
+                if self._stopping:
+                    return
+                job.state = RUNNING
+                job.status = ""
+                job.error = ""
+                job.downloader = Downloader(
+                    progress_cb=lambda percent, job=job: self._on_progress(job, percent),
+                    log_cb=lambda message, job=job: self._log(job, message),
+                    status_cb=lambda message, job=job: self._on_status(job, message),
+                    cache=self.cache,
+                    sessions=self.sessions,
+                    state_cb=lambda state, job=job: self._on_resume_state(job, state),
+                    throttle=(lambda nbytes, job=job: self.bandwidth.consume(job.id, nbytes)) if self.bandwidth else None,
+                    defer_merge=self.postprocess is not None,
+                    format_policy=self.format_policy,
+                    staging_dir=self.staging_dir,
+                )
+                self._running += 1
+            self._record(job)
+            self._notify(job)
+            if self.bandwidth:
+                self.bandwidth.register(job.id, weight=job.weight, priority=job.priority)
+            try:
+                retrying = self._run(job)
+                if not retrying and job.state != MERGING:
+                    self._record_metrics(job)
+                    self._record_history(job, job.downloader.downloaded)
+            finally:
+                if self.bandwidth:
+                    # Frees this job's share for the others right away.
+                    self.bandwidth.unregister(job.id)
+                with self._cond:
+                    job.downloader = None
+                    if job.state in FINISHED_STATES:
+                        # Drop the extracted info dict so long batches don't keep every one alive.
+                        job.options.info = None
+                    self._running -= 1
+                    self._cond.notify_all()
+                self._notify(job)
+
+    def _run(self, job: DownloadJob):
+        if self._already_archived(job):
+            return
+        error = None
+        try:
+            job.downloader.download(job.options)
+        except Exception as exc:
+            error = exc
+        job.stats = dict(job.downloader.stats)
+        wait = job.stats.get("retry_wait_s") or 0.0
+        self._add_retry_stats(job, retries=job.stats.get("retries") or 0, retry_wait_s=wait, retry_lost_s=wait)
+        plan = self._retry_plan(job, error) if error is not None else None
+        with self._cond:
+            state = job.state
+            if error is not None and state == RUNNING:
+                if plan:
+                    job.state = QUEUED
+                    job.retry_at = time.monotonic() + plan[0]
+                    job.status = f"Ponowienie za {plan[0]:.1f}s: {REASONS[plan[1]]}"
+                    self._cond.notify_all()
+                else:
+                    job.state = FAILED
+                    job.error = str(error)
+        if plan and state == RUNNING:
+            self._requeued(job, error, *plan)
+            return True
+        # Also when the download finished just as it was cancelled or paused.
+        if state == CANCELLED:
+            removed = job.downloader.cleanup_temp()
+            if self.journal:
+                self.journal.discard(job.journal_id)
+            self._log(job, f"Anulowano{self._stop_latency(job)}, usuniete pliki: {removed}")
+            return
+        if state in (PAUSED, QUEUED):
+            # Keep .part files so the job continues where it stopped when resumed.
+            self._record(job)
+            self._log(job, f"Wstrzymano{self._stop_latency(job)}")
+            return
+        if error is not None:
+            # Failed jobs stay in the journal with their partial files and can be retried later.
+            self._record(job)
+            self._log(job, f"Blad: {error}")
+            return
+        downloaded = dict(job.downloader.downloaded)
+        merge = job.downloader.pending_merge
+        if merge:
+            with self._cond:
+                merging = job.state == RUNNING
+                if merging:
+                    job.state = MERGING
+                    job.progress = 100.0
+                    job.status = "Oczekuje na scalanie"
+            if merging:
+                self._record(job)
+                self._log(job, "Pobrano, scalanie w tle...")
+                self.postprocess.submit(
+                    job.id,
+                    MergeTask(**merge),
+                    lambda error, timings, job=job: self._on_merged(job, downloaded, merge, error, timings),
+                )
+                return
+        with self._cond:
+            finished = job.state == RUNNING
+            if finished:
+                job.state = DONE
+                job.progress = 100.0
+        if finished:
+            self._complete(job, downloaded)
+
+    def _retry_plan(self, job: DownloadJob, error: Exception):
+        # (delay, kind) when the failed attempt should be repeated, None when the error is final.
+        if not self.retry or job.state != RUNNING:
+            return None
+        stats = job.retry_stats
+        host = host_key(job.options.url)
+        # A 403 is first taken for expired stream URLs (re-extracting is cheap); once fresh URLs
+        # got one too, it is throttling.
+        expired = job.downloader.urls_expired or not stats.get("reextracts")
+        kind = classify(error_text(error), expired=expired)
+        if kind in (THROTTLED, TRANSIENT):
+            opened = self.retry.breaker.record_failure(host)
+            if opened:
+                self._log_batch(f"{host}: nowe pobierania wstrzymane na {opened:.0f}s (powtarzajace sie bledy)")
+        if kind == PERMANENT or stats.get("job_retries", 0) >= self.retry.max_attempts - 1:
+            return None
+        if kind == EXPIRED and stats.get("reextracts", 0) >= self.retry.max_reextracts:
+            kind = THROTTLED
+        if kind == EXPIRED:
+            return 0.0, kind
+        delay = max(self.retry.delay(stats.get("job_retries", 0)), self.retry.breaker.retry_after(host))
+        return delay, kind
+
+    def _requeued(self, job: DownloadJob, error: Exception, delay: float, kind: str):
+        # Runs before the worker releases the job, so no other worker can start it in between.
+        self._add_retry_stats(job, job_retries=1, reextracts=int(kind == EXPIRED), retry_lost_s=delay)
+        if kind == EXPIRED:
+            job.options.info = None
+            if self.cache:
+                self.cache.invalidate(job.options.url)
+        self._record(job)
+        attempt = job.retry_stats["job_retries"]
+        self._log(
+            job,
+            f"Ponowienie {attempt}/{self.retry.max_attempts - 1} za {delay:.1f}s ({REASONS[kind]}): {error}",
+        )
+
+    def _add_retry_stats(self, job: DownloadJob, **values):
+        totals = job.retry_stats
+        for key in ("retries", "retry_wait_s", "job_retries", "reextracts", "retry_lost_s"):
+            totals[key] = totals.get(key, 0) + values.get(key, 0)
+        job.stats.update(totals)
+
+    def _on_merged(self, job: DownloadJob, downloaded: dict, merge: dict, error, timings: dict):
+        job.stats["merge_wait_s"] = timings["wait_s"]
+        job.stats["merge_s"] = timings["run_s"]
+        with self._cond:
+            state = job.state
+            if state == MERGING:
+                job.state = FAILED if error else DONE
+                job.status = ""
+                job.error = error or ""
+        if state == CANCELLED:
+            for path in merge["inputs"]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if self.journal:
+                self.journal.discard(job.journal_id)
+            self._log(job, f"Anulowano{self._stop_latency(job)}")
+        elif state == PAUSED:
+            self._record(job)
+            self._log(job, f"Wstrzymano{self._stop_latency(job)}")
+        elif error:
+            # The downloaded parts stay in the journal; resuming skips straight to the merge.
+            self._record(job)
+            self._log(job, f"Blad: {error}")
+        else:
+            try:
+                job.stats["bytes_written"] = os.path.getsize(downloaded.get("filepath") or "")
+            except OSError:
+                pass
+            self._complete(job, downloaded)
+        self._record_history(job, downloaded)
+        if job.state in FINISHED_STATES:
+            job.options.info = None
+        self._record_metrics(job)
+        self._notify(job)
+
+    def _complete(self, job: DownloadJob, downloaded: dict):
+        if self.retry:
+            self.retry.breaker.record_success(host_key(job.options.url))
+        if self.journal:
+            self.journal.remove(job.journal_id)
+        self._archive(job, downloaded)
+        throughput = job.stats.get("throughput") or 0
+        message = (
+            f"Gotowe. Transfer: {throughput / 1_000_000:.1f}mb/s, "
+            f"rownolegle fragmenty: {job.stats.get('fragment_concurrency', 1)}"
+        )
+        if job.stats.get("ttfb_s") is not None:
+            message += f", TTFB: {job.stats['ttfb_s'] * 1000:.0f}ms"
+        if job.stats.get("merge_s") is not None:
+            message += f", scalanie: {job.stats['merge_s']:.1f}s"
+        if job.stats.get("retries") or job.stats.get("job_retries"):
+            message += (
+                f", ponowienia: {job.stats.get('job_retries', 0)} pobierania / {job.stats.get('retries', 0)} "
+                f"fragmentow, strata: {job.stats.get('retry_lost_s', 0):.1f}s"
+            )
+        self._log(job, message)
+
+    def _already_archived(self, job: DownloadJob) -> bool:
+        if not self.archive:
+            return False
+        try:
+            archived = self.archive.contains_options(job.options)
+        except Exception:
+            archived = False
+        if not archived:
+            return False
+        with self._cond:
+            if job.state == RUNNING:
+                job.state = DONE
+                job.progress = 100.0
+                job.status = "Juz pobrane"
+        if self.journal:
+            self.journal.remove(job.journal_id)
+        self._log(job, "Pominieto: ten film jest juz pobrany (archiwum).")
+        return True
+
+    def _record_metrics(self, job: DownloadJob):
+        if not self.metrics:
+            return
+        try:
+            self.metrics.record(job)
+        except OSError as exc:
+            self._log(job, f"Nie udalo sie zapisac metryk: {exc}")
+
+    def _record_history(self, job: DownloadJob, downloaded: dict):
+        if not self.history or job.state not in FINISHED_STATES:
+            return
+        info = job.options.info.info if job.options.info else {}
+        self.history.add(
+            url=job.options.url,
+            extractor=downloaded.get("extractor") or info.get("extractor_key") or "",
+            video_id=downloaded.get("id") or info.get("id") or "",
+            title=job.title or downloaded.get("title") or info.get("title") or "",
+            quality=job.options.quality,
+            format_ids=job.options.format_ids,
+            status=job.state,
+            error=job.error,
+            output_path=downloaded.get("filepath") or "",
+            bytes=job.stats.get("bytes_written") or job.stats.get("bytes_downloaded") or 0,
+            duration_s=job.stats.get("download_s"),
+        )
+
+    def _archive(self, job: DownloadJob, downloaded: dict):
+        if not self.archive or not downloaded.get("id"):
+            return
+        qualities = [job.options.quality]
+        if downloaded.get("height"):
+            qualities.append(f"{downloaded['height']}p")
+        try:
+            self.archive.add(downloaded["extractor"], downloaded["id"], qualities, downloaded.get("filepath") or "")
+        except OSError as exc:
+            self._log(job, f"Nie udalo sie zapisac archiwum: {exc}")
+
+    def _on_resume_state(self, job: DownloadJob, state: dict):
+        if state.get("format_ids"):
+            job.options.format_ids = state["format_ids"]
+        if self.journal:
+            self.journal.update_progress(job.journal_id, state)
+
+    def _record(self, job: DownloadJob):
+        if self.journal and job.state not in (DONE, CANCELLED):
+            self.journal.record(job.journal_id, job.options, job.title, job.state)
+
+    def _on_progress(self, job: DownloadJob, percent):
+        job.progress = percent
+        self._notify(job)
+
+    def _on_status(self, job: DownloadJob, message):
+        job.status = message
+        self._notify(job)
+
+    def _log(self, job: DownloadJob, message):
+        if self.on_log:
+            self.on_log(job, message)
+
+    def _log_batch(self, message):
+        if self.on_log:
+            self.on_log(None, message)
+
+    def _notify(self, job: DownloadJob):
+        if self.on_update:
+            self.on_update(job)
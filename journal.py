@@ -0,0 +1,115 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from settings import JOURNAL_FILE
+
+# Progress-only updates (fragment counters) are flushed at most this often per job.
+PROGRESS_FLUSH_INTERVAL = 2.0
+PARTIAL_SUFFIXES = (".part", ".ytdl")
+# Per-format intermediates ("title.f137.mp4") that only exist until the merge.
+INTERMEDIATE_RE = re.compile(r"\.f(?:\d[\w-]*|(?:hls|dash|http)-[\w-]+)\.[0-9A-Za-z]+$")
+
+
+class JobJournal:
+    # Durable record of unfinished jobs: URL, options, chosen format IDs, output/partial files and
+    # fragment progress. Entries are removed when a job completes or is explicitly discarded.
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._last_flush = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._entries = {entry["id"]: entry for entry in data.get("jobs", [])}
+        except Exception:
+            self._entries = {}
+
+    def _flush(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"jobs": list(self._entries.values())}, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def record(self, journal_id: str, options, title: str, state: str):
+        with self._lock:
+            entry = self._entries.setdefault(journal_id, {"id": journal_id, "files": [], "format_ids": ""})
+            entry.update(
+                url=options.url,
+                output_dir=options.output_dir,
+                quality=options.quality,
+                fmt=options.fmt,
+                title=title,
+                state=state,
+                updated_at=time.time(),
+            )
+            if options.format_ids:
+                entry["format_ids"] = options.format_ids
+            self._flush()
+
+    def update_progress(self, journal_id: str, resume_state: dict):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(journal_id)
+            if entry is None:
+                return
+            files = entry["files"]
+            new_files = [path for path in resume_state.get("files", []) if path not in files]
+            format_changed = resume_state.get("format_ids") and resume_state["format_ids"] != entry["format_ids"]
+            files.extend(new_files)
+            if resume_state.get("format_ids"):
+                entry["format_ids"] = resume_state["format_ids"]
+            entry["output_path"] = resume_state.get("output_path") or entry.get("output_path", "")
+            entry["fragments"] = {
+                "index": resume_state.get("fragment_index"),
+                "count": resume_state.get("fragment_count"),
+            }
+            entry["downloaded_bytes"] = resume_state.get("downloaded_bytes", 0)
+            entry["updated_at"] = now
+            if new_files or format_changed or now - self._last_flush.get(journal_id, 0) >= PROGRESS_FLUSH_INTERVAL:
+                self._last_flush[journal_id] = now
+                self._flush()
+
+    def remove(self, journal_id: str):
+        with self._lock:
+            self._last_flush.pop(journal_id, None)
+            if self._entries.pop(journal_id, None) is not None:
+                self._flush()
+
+    def discard(self, journal_id: str):
+        # Explicit user discard: delete only the partial files this job was recorded to create.
+        with self._lock:
+            entry = self._entries.get(journal_id)
+            files = list(entry["files"]) if entry else []
+        for path in files:
+            candidates = [path + suffix for suffix in PARTIAL_SUFFIXES]
+            candidates.extend(glob.glob(glob.escape(path) + ".part-Frag*"))
+            if path.endswith(PARTIAL_SUFFIXES) or INTERMEDIATE_RE.search(path):
+                candidates.append(path)
+            for candidate in candidates:
+                try:
+                    if os.path.exists(candidate):
+                        os.remove(candidate)
+                except OSError:
+                    pass
+        self.remove(journal_id)
+
+    def entries(self):
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
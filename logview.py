@@ -0,0 +1,62 @@
+import logging
+import logging.handlers
+import os
+from collections import deque
+
+from settings import LOG_FILE
+
+DEFAULT_CAPACITY = 1000
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+def file_logger(path=LOG_FILE) -> logging.Logger:
+    logger = logging.getLogger("yt_video_download.log")
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class LogView:
+    # Keeps the Text widget at most `capacity` lines; the full history goes to the rotating log file.
+    def __init__(self, widget, capacity=DEFAULT_CAPACITY, logger=None):
+        self.widget = widget
+        self.capacity = capacity
+        self.lines = deque(maxlen=capacity)
+        self.logger = logger if logger is not None else file_logger()
+        self._widget_lines = 0
+
+    def append(self, messages):
+        lines = []
+        for message in messages:
+            lines.extend(str(message).splitlines() or [""])
+        if not lines:
+            return
+        for line in lines:
+            self.logger.info(line)
+        self.lines.extend(lines)
+
+        shown = lines[-self.capacity:]
+        self.widget.configure(state="normal")
+        self.widget.insert("end", "\n".join(shown) + "\n")
+        self._widget_lines += len(shown)
+        excess = self._widget_lines - self.capacity
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+            self._widget_lines = self.capacity
+        self.widget.see("end")
+        self.widget.configure(state="disabled")
+
+    def clear(self):
+        self.lines.clear()
+        self._widget_lines = 0
+        self.widget.configure(state="normal")
+        self.widget.delete("1.0", "end")
+        self.widget.configure(state="disabled")
@@ -1,8 +1,26 @@
-from gui import App
+import multiprocessing
+import sys
+
+import startup
 
 
 def main():
-    app = App()
+    # Bulk analysis runs in spawned worker processes; in the frozen EXE they re-enter here first.
+    multiprocessing.freeze_support()
+    report = "--startup-report" in sys.argv[1:]
+    if report:
+        sys.argv.remove("--startup-report")
+    if len(sys.argv) > 1:
+        # Headless mode (CLI / daemon); tkinter is never imported on this path.
+        from cli import main as cli_main
+
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from gui import App
+
+    startup.mark("gui imported")
+    app = App(startup_report=report)
+    startup.mark("window built")
     app.mainloop()
 
 
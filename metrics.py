@@ -0,0 +1,249 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from settings import METRICS_FILE
+
+SAMPLE_INTERVAL = 1.0
+# Throughput samples per job; when full, every other sample is dropped and the interval doubles.
+MAX_SAMPLES = 120
+# yt-dlp's RetryManager: "... Retrying (2/10)..." / "... Giving up after 10 retries".
+RETRY_RE = re.compile(r"Retrying\b.*\(\d+/\d+\)")
+MERGER = "Merger"
+
+
+class JobMetrics:
+    # Structured timings for one download. Filled from the Downloader's hooks (worker / fragment
+    # threads) and read from the UI, so every access goes through the lock.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self.started_at = time.time()
+        self.info_reused = False
+        self.extract_s = None
+        self.format_select_s = None
+        self.ttfb_s = None
+        self.download_s = None
+        self.postprocess_s = {}
+        self.retries = 0
+        # Time spent sleeping between yt-dlp's fragment / stream retries.
+        self.retry_wait_s = 0.0
+        self.bytes_downloaded = 0
+        self.bytes_written = 0
+        self.samples = []
+        self._interval = SAMPLE_INTERVAL
+        self._download_started = None
+        self._streams = {}
+        self._pp_started = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                setattr(self, f"{name}_s", (getattr(self, f"{name}_s") or 0) + elapsed)
+
+    def timed_selector(self, selector):
+        # yt-dlp consumes the selector with list(); timing it here isolates format selection.
+        def _select(ctx):
+            with self.phase("format_select"):
+                return list(selector(ctx))
+
+        return _select
+
+    def download_started(self):
+        with self._lock:
+            self._download_started = time.perf_counter()
+
+    def on_progress(self, data):
+        now = time.perf_counter()
+        # "finished" events carry only the filename, not the .part name.
+        key = data.get("filename") or data.get("tmpfilename") or ""
+        downloaded = data.get("downloaded_bytes") or 0
+        with self._lock:
+            self._streams[key] = max(downloaded, self._streams.get(key, 0))
+            self.bytes_downloaded = sum(self._streams.values())
+            if self.ttfb_s is None and downloaded > 0 and self._download_started is not None:
+                self.ttfb_s = now - self._download_started
+            if data.get("status") == "finished":
+                self._sample(now, data.get("speed"))
+            elif not self.samples or now - self._t0 - self.samples[-1][0] >= self._interval:
+                self._sample(now, data.get("speed"))
+
+    def _sample(self, now: float, speed):
+        self.samples.append((round(now - self._t0, 3), self.bytes_downloaded, round(speed or 0)))
+        if len(self.samples) > MAX_SAMPLES:
+            self.samples = self.samples[::2]
+            self._interval *= 2
+
+    def on_message(self, message: str):
+        if RETRY_RE.search(message):
+            with self._lock:
+                self.retries += 1
+
+    def on_retry_wait(self, delay: float):
+        with self._lock:
+            self.retry_wait_s += delay
+
+    def on_postprocessor(self, data):
+        name = data.get("postprocessor") or ""
+        now = time.perf_counter()
+        with self._lock:
+            if data.get("status") == "started":
+                self._pp_started[name] = now
+            elif data.get("status") == "finished" and name in self._pp_started:
+                elapsed = now - self._pp_started.pop(name)
+                self.postprocess_s[name] = self.postprocess_s.get(name, 0) + elapsed
+
+    def finish(self, filepath: str = ""):
+        with self._lock:
+            if self._download_started is not None:
+                self.download_s = time.perf_counter() - self._download_started
+        if filepath:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = 0
+            with self._lock:
+                self.bytes_written = size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            transfer_s = (self.download_s or self._since_download()) - sum(self.postprocess_s.values())
+            return {
+                "started_at": self.started_at,
+                "info_reused": self.info_reused,
+                "extract_s": self.extract_s,
+                "format_select_s": self.format_select_s,
+                "ttfb_s": self.ttfb_s,
+                "download_s": self.download_s,
+                "merge_s": self.postprocess_s.get(MERGER),
+                "postprocess_s": dict(self.postprocess_s),
+                "retries": self.retries,
+                "retry_wait_s": self.retry_wait_s,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_written": self.bytes_written,
+                "avg_throughput": self.bytes_downloaded / transfer_s if transfer_s > 0 else 0.0,
+                "samples": list(self.samples),
+            }
+
+    def _since_download(self) -> float:
+        return time.perf_counter() - self._download_started if self._download_started is not None else 0.0
+
+
+class MetricsExporter:
+    # Sink for finished (or interrupted) jobs: one JSON line each in logs/metrics.jsonl, plus running
+    # totals that can be scraped in Prometheus text format from 127.0.0.1 when a port is set.
+    def __init__(self, path=METRICS_FILE, port: int = 0):
+        self.path = path
+        self.port = port
+        # Set by JobQueue: {state: count} for the queue gauges and PostProcessor.stats() for the merge queue.
+        self.gauges = None
+        self.merge_stats = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._totals = {
+            "bytes_downloaded": 0,
+            "bytes_written": 0,
+            "retries": 0,
+            "job_retries": 0,
+            "reextracts": 0,
+        }
+        self._timings = {
+            name: [0.0, 0]
+            for name in (
+                "extract", "format_select", "ttfb", "download", "merge_wait", "merge", "cancel", "retry_lost"
+            )
+        }
+        self._server = None
+        if port:
+            self.serve(port)
+
+    def record(self, job):
+        stats = job.stats or {}
+        line = {
+            "time": time.time(),
+            "job": job.id,
+            "url": job.options.url,
+            "title": job.title,
+            "quality": job.options.quality,
+            "state": job.state,
+            "error": job.error,
+            **{key: value for key, value in stats.items() if key != "fragment_history"},
+        }
+        with self._lock:
+            self._jobs[job.state] = self._jobs.get(job.state, 0) + 1
+            for key in self._totals:
+                self._totals[key] += stats.get(key) or 0
+            for name, timing in self._timings.items():
+                value = stats.get(f"{name}_s")
+                if value is not None:
+                    timing[0] += value
+                    timing[1] += 1
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    def render(self) -> str:
+        lines = [
+            "# HELP ytvd_jobs_total Jobs that stopped running, by final state.",
+            "# TYPE ytvd_jobs_total counter",
+        ]
+        with self._lock:
+            for state, count in sorted(self._jobs.items()):
+                lines.append(f'ytvd_jobs_total{{state="{state}"}} {count}')
+            for key, value in self._totals.items():
+                lines.append(f"# TYPE ytvd_{key}_total counter")
+                lines.append(f"ytvd_{key}_total {value}")
+            for name, (total, count) in self._timings.items():
+                lines.append(f"# TYPE ytvd_{name}_seconds summary")
+                lines.append(f"ytvd_{name}_seconds_sum {total:.6f}")
+                lines.append(f"ytvd_{name}_seconds_count {count}")
+        if self.gauges:
+            lines.append("# TYPE ytvd_queue_jobs gauge")
+            for state, count in sorted(self.gauges().items()):
+                lines.append(f'ytvd_queue_jobs{{state="{state}"}} {count}')
+        if self.merge_stats:
+            merge = self.merge_stats()
+            lines.append("# TYPE ytvd_merge_queue_depth gauge")
+            lines.append(f"ytvd_merge_queue_depth {merge['queued']}")
+            lines.append("# TYPE ytvd_merge_running gauge")
+            lines.append(f"ytvd_merge_running {merge['running']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        # Bound to localhost only; scrapers run on the same machine.
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
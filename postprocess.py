@@ -0,0 +1,223 @@
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from downloader import ffmpeg_location
+from storage import move_file
+
+# FFmpeg merges are mostly disk-bound stream copies; a couple in parallel keeps the disk busy
+# without starving the downloads.
+DEFAULT_MAX_PROCS = max(1, min(4, (os.cpu_count() or 2) // 2))
+# FFmpeg gets this long to exit after terminate() before it is killed.
+KILL_GRACE_S = 2.0
+
+
+@dataclass
+class MergeTask:
+    # Separately downloaded format files ("title [id].f137.mp4", "title [id].f140.m4a") and the
+    # final container they are stream-copied into.
+    inputs: list
+    output: str
+    # Per input: {"video": bool, "audio": bool, "optional": bool, "adts": bool}, as yt-dlp's merger
+    # maps them ("adts": HLS AAC that needs aac_adtstoasc); empty maps every stream of every input.
+    streams: list = field(default_factory=list)
+    # Extra FFmpeg output options (metadata, remux flags) applied to the merged file.
+    extra_args: list = field(default_factory=list)
+    # Set when the merge runs in a staging directory: the merged file is moved here afterwards.
+    destination: str = ""
+
+
+class PostProcessor:
+    # Post-processing stage with its own bounded set of FFmpeg processes, so a download slot is
+    # released as soon as the bytes are on disk. done_cb(error, timings) runs on the pool's thread.
+    def __init__(self, max_procs: int = DEFAULT_MAX_PROCS):
+        self.max_procs = max(1, int(max_procs))
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._procs = {}
+        self._active = set()
+        self._cancelled = set()
+        self._workers = []
+        self._stopping = False
+        self._completed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._max_depth = 0
+
+    def submit(self, key, task: MergeTask, done_cb):
+        with self._cond:
+            self._queue.append((key, task, done_cb, time.perf_counter()))
+            self._max_depth = max(self._max_depth, len(self._queue))
+            self._workers = [t for t in self._workers if t.is_alive()]
+            if len(self._workers) < self.max_procs:
+                worker = threading.Thread(target=self._worker, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._cond.notify()
+
+    def cancel(self, key) -> bool:
+        with self._cond:
+            for item in list(self._queue):
+                if item[0] == key:
+                    self._queue.remove(item)
+                    queued = item
+                    break
+            else:
+                queued = None
+            if queued is None:
+                if key not in self._active:
+                    return False
+                self._cancelled.add(key)
+                proc = self._procs.get(key)
+                if proc is not None:
+                    self._stop(proc)
+                return True
+        _key, _task, done_cb, queued_at = queued
+        done_cb("Anulowano", {"wait_s": time.perf_counter() - queued_at, "run_s": 0.0})
+        return True
+
+    def is_idle(self) -> bool:
+        with self._cond:
+            return not self._queue and not self._active
+
+    def stats(self) -> dict:
+        with self._cond:
+            finished = self._completed + self._failed
+            return {
+                "queued": len(self._queue),
+                "running": len(self._active),
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_queued": self._max_depth,
+                "avg_wait_s": self._wait_total / finished if finished else 0.0,
+                "avg_run_s": self._run_total / finished if finished else 0.0,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            keys = [item[0] for item in self._queue] + list(self._active)
+            self._cond.notify_all()
+        for key in keys:
+            self.cancel(key)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    if not self._cond.wait(timeout=30):
+                        # Idle workers exit; submit() starts new ones when needed.
+                        if not self._queue:
+                            self._workers = [t for t in self._workers if t is not threading.current_thread()]
+                            return
+                if not self._queue:
+                    return
+                key, task, done_cb, queued_at = self._queue.popleft()
+                self._active.add(key)
+            started = time.perf_counter()
+            try:
+                error = self._merge(key, task)
+            except Exception as exc:
+                # The job waits for done_cb and is_idle() for _active; both must happen regardless.
+                error = f"Scalanie nie powiodlo sie: {exc}"
+            finished = time.perf_counter()
+            with self._cond:
+                self._active.discard(key)
+                self._procs.pop(key, None)
+                if key in self._cancelled:
+                    self._cancelled.discard(key)
+                    error = "Anulowano"
+                if error:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._wait_total += started - queued_at
+                self._run_total += finished - started
+            done_cb(error, {"wait_s": started - queued_at, "run_s": finished - started})
+
+    def _merge(self, key, task: MergeTask):
+        ffmpeg = ffmpeg_location()
+        if not ffmpeg:
+            return "Brak FFmpeg. Umiesc bin/ffmpeg.exe obok aplikacji (bez PATH)."
+        root, ext = os.path.splitext(task.output)
+        # FFmpeg picks the muxer from the extension, so the temporary name keeps it.
+        temp_output = f"{root}.temp{ext}"
+        command = [ffmpeg, "-y", "-nostdin", "-loglevel", "error"]
+        for path in task.inputs:
+            command += ["-i", path]
+        command += self._map_args(task)
+        command += ["-c", "copy", "-movflags", "+faststart", *task.extra_args, temp_output]
+        creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        try:
+            with self._cond:
+                if key in self._cancelled:
+                    return "Anulowano"
+                proc = subprocess.Popen(
+                    command,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    creationflags=creationflags,
+                )
+                self._procs[key] = proc
+            _stdout, stderr = proc.communicate()
+        except OSError as exc:
+            return f"Nie udalo sie uruchomic FFmpeg: {exc}"
+        if proc.returncode != 0:
+            self._remove(temp_output)
+            message = stderr.decode("utf-8", "replace").strip().splitlines()
+            return f"Scalanie nie powiodlo sie: {message[-1] if message else proc.returncode}"
+        os.replace(temp_output, task.output)
+        for path in task.inputs:
+            # A remux has a single input under the output's own name.
+            if path != task.output:
+                self._remove(path)
+        if task.destination:
+            try:
+                move_file(task.output, task.destination)
+            except OSError as exc:
+                return f"Nie udalo sie przeniesc pliku do folderu zapisu: {exc}"
+        return None
+
+    def _map_args(self, task: MergeTask) -> list:
+        if not task.streams:
+            return [arg for index in range(len(task.inputs)) for arg in ("-map", str(index))]
+        args = []
+        audio_streams = 0
+        for index, stream in enumerate(task.streams):
+            # "?" lets FFmpeg skip a stream the format list could not vouch for.
+            optional = "?" if stream.get("optional") else ""
+            if stream.get("audio"):
+                args += ["-map", f"{index}:a:0{optional}"]
+                if stream.get("adts"):
+                    args += [f"-bsf:a:{audio_streams}", "aac_adtstoasc"]
+                audio_streams += 1
+            if stream.get("video"):
+                args += ["-map", f"{index}:v:0{optional}"]
+        return args
+
+    def _stop(self, proc):
+        try:
+            proc.terminate()
+        except OSError:
+            return
+        timer = threading.Timer(KILL_GRACE_S, self._kill, args=(proc,))
+        timer.daemon = True
+        timer.start()
+
+    def _kill(self, proc):
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+    def _remove(self, path: str):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,143 @@
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+# What a failure means for the next attempt.
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+# 403 on a stream whose signed URLs are past their expiry: fixed by extracting again, not by waiting.
+EXPIRED = "expired"
+
+REASONS = {
+    TRANSIENT: "blad sieci lub serwera",
+    THROTTLED: "serwer ogranicza pobieranie",
+    EXPIRED: "linki do strumieni wygasly",
+}
+
+# yt-dlp messages ("HTTP Error 429: Too Many Requests") and our own normalized ones ("(HTTP 403)").
+HTTP_STATUS_RE = re.compile(r"HTTP (?:Error )?(\d{3})")
+TRANSIENT_RE = re.compile(
+    r"timed out|Connection (?:reset|refused|aborted)|Remote end closed|IncompleteRead|Content too short"
+    r"|Temporary failure in name resolution|Network is unreachable|EOF occurred|did not get any data",
+    re.IGNORECASE,
+)
+
+# Retries inside one download (yt-dlp: a failing fragment or stream only); the sleep between them
+# is backoff_delay() with these bounds.
+STREAM_RETRIES = 5
+FRAGMENT_RETRIES = 10
+STREAM_RETRY_BASE = 0.5
+STREAM_RETRY_CAP = 10.0
+
+
+def classify(message: str, expired: bool = False) -> str:
+    match = HTTP_STATUS_RE.search(message or "")
+    if match:
+        status = int(match.group(1))
+        if status == 403:
+            return EXPIRED if expired else THROTTLED
+        if status == 429:
+            return THROTTLED
+        if status == 408 or 500 <= status < 600:
+            return TRANSIENT
+        return PERMANENT
+    if TRANSIENT_RE.search(message or ""):
+        return TRANSIENT
+    return PERMANENT
+
+
+def error_text(exc: BaseException) -> str:
+    # Downloader errors carry a normalized Polish message; yt-dlp's original is the cause.
+    parts = [str(exc)]
+    if exc.__cause__ is not None:
+        parts.append(str(exc.__cause__))
+    return " ".join(parts)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # "Full jitter": uniform in [0, min(cap, base * 2^attempt)], so retries from many jobs spread out
+    # instead of hitting a recovering server together.
+    return random.uniform(0, min(cap, base * (2 ** max(0, attempt))))
+
+
+# Domains served by the same backend as another one.
+HOST_ALIASES = {
+    "youtu.be": "youtube.com",
+    "youtube-nocookie.com": "youtube.com",
+}
+# Second-level labels under country TLDs that are registries, not sites ("bbc.co.uk").
+PUBLIC_SECOND_LEVEL = ("co", "com", "net", "org", "gov", "edu", "ac", "ne", "or")
+
+
+def host_key(url: str) -> str:
+    # The registrable domain, so "music.youtube.com", "m.youtube.com" and "youtu.be" share one
+    # breaker. Without a public suffix list, a short second-level label under a two-letter TLD
+    # counts as part of the suffix.
+    host = (urlparse(url).hostname or "").lower().rstrip(".")
+    labels = host.split(".")
+    if len(labels) <= 2 or all(label.isdigit() for label in labels) or ":" in host:
+        domain = host
+    elif len(labels[-1]) == 2 and labels[-2] in PUBLIC_SECOND_LEVEL:
+        domain = ".".join(labels[-3:])
+    else:
+        domain = ".".join(labels[-2:])
+    return HOST_ALIASES.get(domain, domain)
+
+
+class CircuitBreaker:
+    # Per host: after `threshold` throttling or server failures in a row, no new job for that host
+    # starts until the cooldown has passed; jobs for other hosts keep the workers. A failure after
+    # the cooldown opens it again right away, with the cooldown doubled up to max_cooldown.
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.threshold = max(1, int(threshold))
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        # host -> [consecutive failures, open until (monotonic), current cooldown]
+        self._hosts = {}
+
+    def allow(self, host: str) -> bool:
+        return self.retry_after(host) <= 0
+
+    def retry_after(self, host: str) -> float:
+        with self._lock:
+            state = self._hosts.get(host)
+            return max(0.0, state[1] - time.monotonic()) if state else 0.0
+
+    def record_failure(self, host: str) -> float:
+        # Returns the cooldown when this failure opened the breaker, else 0.
+        with self._lock:
+            state = self._hosts.setdefault(host, [0, 0.0, 0.0])
+            state[0] += 1
+            if state[0] < self.threshold or state[1] > time.monotonic():
+                return 0.0
+            state[2] = min(self.max_cooldown, state[2] * 2 if state[2] else self.cooldown)
+            state[1] = time.monotonic() + state[2]
+            return state[2]
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def open_hosts(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {host: state[1] - now for host, state in self._hosts.items() if state[1] > now}
+
+
+@dataclass
+class RetryPolicy:
+    # Whole-job attempts after yt-dlp's own fragment / stream retries gave up. Partial files stay,
+    # so a new attempt resumes where the last one stopped.
+    max_attempts: int = 4
+    max_reextracts: int = 2
+    base_delay: float = 5.0
+    max_delay: float = 120.0
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+
+    def delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
@@ -0,0 +1,99 @@
+import threading
+from contextlib import contextmanager
+
+from downloader import SOCKET_TIMEOUT, load_yt_dlp
+from settings import MAX_WORKERS_LIMIT
+
+# One session per download worker plus room for analysis running alongside.
+DEFAULT_POOL_SIZE = MAX_WORKERS_LIMIT + 2
+BASE_OPTIONS = {
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+    "noplaylist": True,
+    # Request handlers read this once, when the session is created.
+    "socket_timeout": SOCKET_TIMEOUT,
+}
+
+
+class SessionPool:
+    # Long-lived YoutubeDL instances keep their HTTP connections (keep-alive), cookie jar and
+    # extractor instances (player JS / signature cache) between jobs.
+    def __init__(self, size=DEFAULT_POOL_SIZE, base_options=None):
+        self.size = size
+        self.base_options = dict(base_options or BASE_OPTIONS)
+        self._cond = threading.Condition()
+        self._idle = []
+        self._all = []
+        self._borrowed = 0
+        self._reused = 0
+
+    @contextmanager
+    def session(self, options: dict):
+        ydl = self._acquire()
+        saved = self._apply(ydl, options)
+        try:
+            yield ydl
+        finally:
+            self._restore(ydl, saved)
+            self._release(ydl)
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and len(self._all) >= self.size:
+                self._cond.wait()
+            self._borrowed += 1
+            if self._idle:
+                self._reused += 1
+                return self._idle.pop()
+        ydl = load_yt_dlp().YoutubeDL(dict(self.base_options))
+        with self._cond:
+            self._all.append(ydl)
+        return ydl
+
+    def _release(self, ydl):
+        with self._cond:
+            self._idle.append(ydl)
+            self._cond.notify()
+
+    def _apply(self, ydl, options: dict):
+        saved = dict(ydl.params)
+        ydl.params.update(options)
+        if "outtmpl" in options:
+            outtmpl = options["outtmpl"]
+            ydl.params["outtmpl"] = dict(outtmpl) if isinstance(outtmpl, dict) else {"default": outtmpl}
+            ydl._parse_outtmpl()
+        self._rebuild_state(ydl)
+        return saved
+
+    def _restore(self, ydl, saved: dict):
+        ydl.params.clear()
+        ydl.params.update(saved)
+        self._rebuild_state(ydl)
+
+    def _rebuild_state(self, ydl):
+        # Mirrors the parts of YoutubeDL.__init__ derived from per-job params.
+        fmt = ydl.params.get("format")
+        ydl.format_selector = fmt if fmt in (None, "-") or callable(fmt) else ydl.build_format_selector(fmt)
+        ydl._progress_hooks = list(ydl.params.get("progress_hooks") or [])
+        ydl._postprocessor_hooks = list(ydl.params.get("postprocessor_hooks") or [])
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls.clear()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "sessions": len(self._all),
+                "idle": len(self._idle),
+                "borrowed": self._borrowed,
+                "reused": self._reused,
+            }
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._all = [ydl for ydl in self._all if ydl not in idle]
+        for ydl in idle:
+            ydl.close()
@@ -1,7 +1,7 @@
 import json
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 def _app_dir() -> str:
@@ -11,14 +11,52 @@ def _app_dir() -> str:
     return os.path.dirname(__file__)
 
 
+def _int_setting(value, default: int, low: int, high: int) -> int:
+    try:
+        return max(low, min(int(value), high))
+    except (TypeError, ValueError):
+        return default
+
+
+def _float_setting(value, default: float) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
 BASE_DIR = _app_dir()
 SETTINGS_FILE = os.path.join(BASE_DIR, "settings.json")
 DEFAULT_OUTPUT = os.path.join(BASE_DIR, "videos")
+CACHE_FILE = os.path.join(BASE_DIR, "cache", "metadata.sqlite3")
+LOG_FILE = os.path.join(BASE_DIR, "logs", "app.log")
+JOURNAL_FILE = os.path.join(BASE_DIR, "journal.json")
+ARCHIVE_FILE = os.path.join(BASE_DIR, "archive.txt")
+METRICS_FILE = os.path.join(BASE_DIR, "logs", "metrics.jsonl")
+HISTORY_FILE = os.path.join(BASE_DIR, "history.sqlite3")
+DEFAULT_MAX_WORKERS = 3
+MAX_WORKERS_LIMIT = 8
 
 
 @dataclass
 class Settings:
     output_dir: str
+    # Fast local directory for .part files and merges (empty = output_dir).
+    staging_dir: str = ""
+    max_workers: int = DEFAULT_MAX_WORKERS
+    # Global cap in MB/s (0 = no limit) and optional time windows:
+    # [{"start": "08:00", "end": "17:00", "limit_mbps": 2.0}]
+    bandwidth_limit_mbps: float = 0.0
+    bandwidth_schedule: list = field(default_factory=list)
+    # Prometheus text endpoint on 127.0.0.1:<port>/metrics (0 = off).
+    metrics_port: int = 0
+    # Use AV1/VP9 instead of H.264 when that makes the download at least this much smaller.
+    prefer_efficient_codecs: bool = True
+    codec_min_savings_pct: float = 20.0
+    # Treat the chosen quality as a minimum instead of a maximum (see formats.FormatPolicy).
+    quality_floor: bool = False
+    # Put links copied anywhere into the URL field (and start analyzing them).
+    watch_clipboard: bool = False
 
 
 class SettingsStore:
@@ -31,7 +69,18 @@ class SettingsStore:
                 # Migrate old default (base dir) to ./videos
                 if os.path.abspath(output_dir) == os.path.abspath(BASE_DIR):
                     output_dir = DEFAULT_OUTPUT
-                return Settings(output_dir=output_dir)
+                return Settings(
+                    output_dir=output_dir,
+                    staging_dir=data.get("staging_dir") or "",
+                    max_workers=_int_setting(data.get("max_workers"), DEFAULT_MAX_WORKERS, 1, MAX_WORKERS_LIMIT),
+                    bandwidth_limit_mbps=_float_setting(data.get("bandwidth_limit_mbps"), 0.0),
+                    bandwidth_schedule=data.get("bandwidth_schedule") or [],
+                    metrics_port=_int_setting(data.get("metrics_port"), 0, 0, 65535),
+                    prefer_efficient_codecs=bool(data.get("prefer_efficient_codecs", True)),
+                    codec_min_savings_pct=min(_float_setting(data.get("codec_min_savings_pct"), 20.0), 90.0),
+                    quality_floor=bool(data.get("quality_floor", False)),
+                    watch_clipboard=bool(data.get("watch_clipboard", False)),
+                )
             except Exception:
                 pass
         return Settings(output_dir=DEFAULT_OUTPUT)
@@ -39,6 +88,15 @@ class SettingsStore:
     def save(self, settings: Settings):
         data = {
             "output_dir": settings.output_dir,
+            "staging_dir": settings.staging_dir,
+            "max_workers": settings.max_workers,
+            "bandwidth_limit_mbps": settings.bandwidth_limit_mbps,
+            "bandwidth_schedule": settings.bandwidth_schedule,
+            "metrics_port": settings.metrics_port,
+            "prefer_efficient_codecs": settings.prefer_efficient_codecs,
+            "codec_min_savings_pct": settings.codec_min_savings_pct,
+            "quality_floor": settings.quality_floor,
+            "watch_clipboard": settings.watch_clipboard,
         }
         with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,106 @@
+import threading
+from urllib.parse import urlparse
+
+# Quiet time after the last keystroke or paste before an extraction starts.
+DEBOUNCE_MS = 400
+# Abandoned extractions are cancelled but may take a moment to unwind; this caps how many may be
+# running at once.
+MAX_IN_FLIGHT = 2
+MAX_URL_LENGTH = 2048
+
+
+def looks_like_url(text: str) -> bool:
+    # Cheap check before spending an extraction on whatever is in the field or the clipboard.
+    text = (text or "").strip()
+    if not text or len(text) > MAX_URL_LENGTH or any(ch.isspace() for ch in text):
+        return False
+    try:
+        parsed = urlparse(text)
+    except ValueError:
+        return False
+    host = parsed.hostname or ""
+    return parsed.scheme in ("http", "https") and "." in host and not host.endswith(".")
+
+
+class SpeculativeAnalyzer:
+    # Analyzes the link in the URL field before the user asks for it. Only the newest link counts:
+    # submit() and cancel() start a new generation, and extractions of older ones are cancelled
+    # (each runs on its own Downloader) or, if they finish anyway, their results are dropped. When
+    # MAX_IN_FLIGHT are busy, the newest link waits for a free slot, and a newer one replaces it.
+    def __init__(self, new_downloader, on_done, max_in_flight: int = MAX_IN_FLIGHT):
+        # Returns a fresh Downloader for one analysis; cancelling it must not touch anything else.
+        self.new_downloader = new_downloader
+        # Called from a worker thread with (generation, url, result, error) for current results only.
+        self.on_done = on_done
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._url = ""
+        # (result, error) of the current generation once it has finished.
+        self._done = None
+        self._running = 0
+        self._waiting = None
+        # generation -> Downloader of each running extraction.
+        self._active = {}
+
+    def submit(self, url: str) -> bool:
+        # False when this link is already being analyzed or has been analyzed successfully; a
+        # failed one is tried again.
+        with self._lock:
+            if url == self._url and not (self._done and self._done[1]):
+                return False
+            self._generation += 1
+            self._url = url
+            self._done = None
+            stale = list(self._active.values())
+            if self._running >= self.max_in_flight:
+                self._waiting = (self._generation, url)
+            else:
+                self._waiting = None
+                self._start(self._generation, url)
+        self._abort(stale)
+        return True
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            self._url = ""
+            self._done = None
+            self._waiting = None
+            stale = list(self._active.values())
+        self._abort(stale)
+
+    def is_current(self, generation: int) -> bool:
+        with self._lock:
+            return generation == self._generation
+
+    def result(self, url: str):
+        # (result, error) when url was the last submitted link and it has finished, else None.
+        with self._lock:
+            return self._done if url == self._url else None
+
+    def _start(self, generation: int, url: str):
+        self._running += 1
+        downloader = self._active[generation] = self.new_downloader()
+        threading.Thread(target=self._run, args=(generation, url, downloader), daemon=True).start()
+
+    def _abort(self, downloaders):
+        for downloader in downloaders:
+            downloader.cancel()
+
+    def _run(self, generation: int, url: str, downloader):
+        try:
+            result, error = downloader.analyze(url), ""
+        except Exception as exc:
+            result, error = None, str(exc) or type(exc).__name__
+        with self._lock:
+            self._running -= 1
+            self._active.pop(generation, None)
+            current = generation == self._generation
+            if current:
+                self._done = (result, error)
+            if self._waiting is not None:
+                waiting, self._waiting = self._waiting, None
+                self._start(*waiting)
+        if current:
+            self.on_done(generation, url, result, error)
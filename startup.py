@@ -0,0 +1,79 @@
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Reference point for all marks; main.py imports this module first.
+_T0 = time.perf_counter()
+_marks = []
+_lock = threading.Lock()
+
+# Import-time budgets (ms, cumulative) checked by `python startup.py`.
+IMPORT_BUDGET_MS = {
+    "gui": 400,
+    "cli": 300,
+}
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def mark(name: str):
+    with _lock:
+        if not any(existing == name for existing, _ in _marks):
+            _marks.append((name, (time.perf_counter() - _T0) * 1000))
+
+
+def marks():
+    with _lock:
+        return list(_marks)
+
+
+def report() -> str:
+    lines = ["Czasy startu (ms od uruchomienia main.py):"]
+    for name, elapsed in marks():
+        lines.append(f"  {elapsed:8.1f}  {name}")
+    return "\n".join(lines)
+
+
+def import_breakdown(module: str, top: int = 15):
+    # Same data as `python -X importtime`, measured in a fresh interpreter so nothing is cached.
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    names = set()
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        names.add(name)
+        if name == module:
+            total_us = int(cumulative_us)
+        # Depth 1 (one level below the measured module) gives a readable per-package breakdown.
+        if len(indent) <= 3:
+            entries.append((name, int(self_us), int(cumulative_us)))
+    entries.sort(key=lambda item: item[2], reverse=True)
+    return total_us / 1000, entries[:top], names
+
+
+def main() -> int:
+    failed = False
+    for module, budget in IMPORT_BUDGET_MS.items():
+        total_ms, entries, names = import_breakdown(module)
+        status = "OK" if total_ms <= budget else "PRZEKROCZONO"
+        failed = failed or total_ms > budget
+        print(f"import {module}: {total_ms:.1f} ms (budzet {budget} ms) {status}")
+        for name, self_us, cumulative_us in entries:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {self_us / 1000:8.1f} ms  {name}")
+        if "yt_dlp" in names:
+            print(f"  UWAGA: {module} importuje yt_dlp przy starcie")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
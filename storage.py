@@ -0,0 +1,97 @@
+import os
+import shutil
+
+from formats import format_size
+
+COPY_BUFFER = 4 * 1024 * 1024
+# Headroom on top of the expected size: estimates are approximate and the container adds a little.
+FREE_SPACE_MARGIN = 64 * 1024 * 1024
+FREE_SPACE_FACTOR = 1.05
+
+
+def _existing_parent(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def free_space(path: str) -> int:
+    return shutil.disk_usage(_existing_parent(path)).free
+
+
+def same_filesystem(a: str, b: str) -> bool:
+    try:
+        return os.stat(_existing_parent(a)).st_dev == os.stat(_existing_parent(b)).st_dev
+    except OSError:
+        return False
+
+
+def check_free_space(expected: int, output_dir: str, staging_dir: str = "", merge: bool = False):
+    # Raises before any byte is written when a disk cannot hold the download. A merge keeps the
+    # parts and the merged file side by side, so it needs twice the size where it runs.
+    if not expected:
+        return
+    work_dir = staging_dir or output_dir
+    needs = {work_dir: expected * (2 if merge else 1)}
+    if staging_dir and not same_filesystem(staging_dir, output_dir):
+        needs[output_dir] = expected
+    for path, size in needs.items():
+        needed = int(size * FREE_SPACE_FACTOR) + FREE_SPACE_MARGIN
+        try:
+            available = free_space(path)
+        except OSError:
+            continue
+        if available < needed:
+            raise RuntimeError(
+                f"Za malo miejsca na dysku ({path}): potrzeba ok. {format_size(needed)}, "
+                f"wolne {format_size(available)}."
+            )
+
+
+def move_file(src: str, dest_dir: str) -> str:
+    # Finished file from the staging directory into dest_dir, in one visible step: a rename on the
+    # same filesystem, otherwise a copy to a hidden name, fsync, rename, then the source is removed.
+    os.makedirs(dest_dir, exist_ok=True)
+    dest = os.path.join(dest_dir, os.path.basename(src))
+    if os.path.abspath(src) == os.path.abspath(dest):
+        return dest
+    if same_filesystem(src, dest_dir):
+        os.replace(src, dest)
+        return dest
+    temp = os.path.join(dest_dir, f".{os.path.basename(src)}.moving")
+    try:
+        with open(src, "rb") as fsrc, open(temp, "wb") as fdst:
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFFER)
+            fdst.flush()
+            os.fsync(fdst.fileno())
+        shutil.copystat(src, temp)
+        os.replace(temp, dest)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(dest_dir)
+    os.remove(src)
+    return dest
+
+
+def _fsync_dir(path: str):
+    # Makes the rename itself durable; directories cannot be opened this way on Windows.
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)